@@ -0,0 +1,58 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from config import EC2_MAX_WORKERS
+
+class AsyncEC2Manager:
+    def __init__(self, manager, max_workers=EC2_MAX_WORKERS):
+        self.manager = manager
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ec2')
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    async def get_all_instances(self, use_cache=True):
+        # Cache hits are answered on the loop; anything that may call AWS or wait on a lock goes to the executor
+        if use_cache:
+            cached = self.manager.cached_instances()
+            if cached is not None:
+                return cached
+        return await self._run(self.manager.get_all_instances, use_cache)
+
+    async def find_instances(self, text):
+        return await self._run(self.manager.find_instances, text)
+
+    async def get_instance(self, instance_id):
+        return await self._run(self.manager.get_instance, instance_id)
+
+    async def get_instances(self, instance_ids):
+        return await self._run(self.manager.get_instances, instance_ids)
+
+    async def get_instance_states(self, instance_ids):
+        return await self._run(self.manager.get_instance_states, instance_ids)
+
+    def invalidate_cache(self):
+        self.manager.invalidate_cache()
+
+    async def start_instance(self, instance_id):
+        return await self._run(self.manager.start_instance, instance_id)
+
+    async def stop_instance(self, instance_id):
+        return await self._run(self.manager.stop_instance, instance_id)
+
+    async def start_instances(self, instance_ids):
+        return await self._run(self.manager.start_instances, instance_ids)
+
+    async def stop_instances(self, instance_ids):
+        return await self._run(self.manager.stop_instances, instance_ids)
+
+    async def start_all_instances(self):
+        return await self._run(self.manager.start_all_instances)
+
+    async def stop_all_instances(self):
+        return await self._run(self.manager.stop_all_instances)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+        self.manager.region_executor.shutdown(wait=False)
@@ -1,65 +1,256 @@
 import boto3
 from botocore.exceptions import ClientError
-from config import AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_REGION
+from concurrent.futures import ThreadPoolExecutor
+from config import AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_REGIONS, EC2_BATCH_SIZE, EC2_PAGE_SIZE, EC2_CACHE_TTL
+from metrics import instrument_boto_client
 import os
+import bisect
+import threading
+import time
+
+MANAGED_STATES = ['pending', 'running', 'shutting-down', 'stopping', 'stopped']
+
+class InventorySnapshot:
+    # One inventory fetch with its lookup indexes. Built before it is published and never changed afterwards,
+    # so a reader holding a snapshot always sees matching indexes.
+
+    def __init__(self, instances):
+        self.instances = instances
+        self.by_id = {instance['id']: instance for instance in instances}
+        self.search_ids = sorted(self.by_id)
+        self.search_names = [(instance['name'].lower(), instance) for instance in instances]
 
 class EC2Manager:
-    def __init__(self):
+    def __init__(self, regions=AWS_REGIONS):
+        self.regions = list(regions) or [None]
         self.session = boto3.Session(
             aws_access_key_id=AWS_ACCESS_KEY_ID,
             aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-            region_name=AWS_REGION
+            region_name=self.regions[0]
         )
-        self.ec2 = self.session.resource('ec2')
-        self.client = self.session.client('ec2')
+        self.clients = {region: instrument_boto_client(self.session.client('ec2', region_name=region)) for region in self.regions}
+        self.resources = {region: self.session.resource('ec2', region_name=region) for region in self.regions}
+        for resource in self.resources.values():
+            instrument_boto_client(resource.meta.client)
+        self.region_executor = ThreadPoolExecutor(max_workers=len(self.regions), thread_name_prefix='ec2-region')
         self.instances_to_ignore = self._load_ignored_instances()
+        self.cache_ttl = EC2_CACHE_TTL
+        self._inventory = None
+        self._inventory_loaded_at = 0
+        self._inventory_generation = 0
+        self._inventory_lock = threading.Lock()
     
     def _load_ignored_instances(self):
         ignored = os.getenv('INSTANCES_TO_IGNORE', '')
         if ignored:
-            return [instance_id.strip() for instance_id in ignored.split(',') if instance_id.strip()]
-        return []
+            return {instance_id.strip() for instance_id in ignored.split(',') if instance_id.strip()}
+        return set()
     
     def _should_ignore_instance(self, instance_id):
         return instance_id in self.instances_to_ignore
 
-    def get_all_instances(self):
-        instances = []
-        response = self.client.describe_instances()
-        
-        for reservation in response['Reservations']:
-            for instance in reservation['Instances']:
-                instance_id = instance['InstanceId']
-                state = instance['State']['Name']
-                
-                if state == 'terminated':
-                    continue
-                
-                instance_name = next((tag['Value'] for tag in instance.get('Tags', []) if tag['Key'] == 'Name'), '')
-                if not instance_name:
-                    continue
-                
-                if not self._should_ignore_instance(instance_id):
-                    instances.append({
-                        'id': instance_id,
-                        'state': state,
-                        'name': instance_name
-                    })
-        
-        return instances
+    def _map_regions(self, func, regions):
+        # Runs func once per region in parallel, so N regions cost about as much as the slowest one
+        regions = list(regions)
+        if len(regions) == 1:
+            return {regions[0]: func(regions[0])}
+        futures = {region: self.region_executor.submit(func, region) for region in regions}
+        return {region: future.result() for region, future in futures.items()}
+
+    def _known_instances(self):
+        inventory = self._inventory
+        return inventory.by_id if inventory is not None else {}
+
+    def _regions_for(self, instance_ids):
+        known = self._known_instances()
+        if len(self.regions) > 1 and any(i not in known for i in instance_ids):
+            self.get_all_instances()
+            known = self._known_instances()
+        
+        grouped = {}
+        for instance_id in instance_ids:
+            region = known[instance_id]['region'] if instance_id in known else self.regions[0]
+            grouped.setdefault(region, []).append(instance_id)
+        return grouped
+
+    def _to_instance(self, instance, region):
+        instance_id = instance['InstanceId']
+        state = instance['State']['Name']
+        
+        if state == 'terminated':
+            return None
+        
+        instance_name = next((tag['Value'] for tag in instance.get('Tags', []) if tag['Key'] == 'Name'), '')
+        if not instance_name:
+            return None
+        
+        if self._should_ignore_instance(instance_id):
+            return None
+        
+        return {
+            'id': instance_id,
+            'state': state,
+            'name': instance_name,
+            'region': region
+        }
+
+    def _list_region(self, region):
+        try:
+            return list(self.iter_instances(region))
+        except ClientError as e:
+            print(f"Error listing instances in {region}: {e}")
+            return []
+
+    def iter_instances(self, region=None):
+        if region is None and len(self.regions) > 1:
+            for instances in self._map_regions(self._list_region, self.regions).values():
+                yield from instances
+            return
+        
+        region = region or self.regions[0]
+        paginator = self.clients[region].get_paginator('describe_instances')
+        pages = paginator.paginate(
+            Filters=[
+                {'Name': 'instance-state-name', 'Values': MANAGED_STATES},
+                {'Name': 'tag-key', 'Values': ['Name']}
+            ],
+            PaginationConfig={'PageSize': EC2_PAGE_SIZE}
+        )
+        
+        for page in pages:
+            for reservation in page['Reservations']:
+                for instance in reservation['Instances']:
+                    item = self._to_instance(instance, region)
+                    if item:
+                        yield item
+
+    def _fresh_inventory(self):
+        inventory = self._inventory
+        if inventory is None or time.monotonic() - self._inventory_loaded_at >= self.cache_ttl:
+            return None
+        return inventory
+
+    def is_inventory_fresh(self):
+        return self._fresh_inventory() is not None
+
+    def cached_instances(self):
+        # Never blocks or refreshes: the fresh inventory, or None when it must be fetched
+        inventory = self._fresh_inventory()
+        return list(inventory.instances) if inventory is not None else None
+
+    def invalidate_cache(self):
+        self._inventory_generation += 1
+        self._inventory_loaded_at = 0
+
+    def refresh_inventory(self):
+        # Callers hold _inventory_lock, so only one refresh talks to AWS at a time
+        generation = self._inventory_generation
+        # Sorted once per refresh so paged menus are stable between clicks
+        inventory = InventorySnapshot(sorted(self.iter_instances(), key=lambda i: (i['name'].lower(), i['id'])))
+        self._inventory = inventory
+        # Only mark the snapshot fresh if no action invalidated it while it was being fetched
+        if generation == self._inventory_generation:
+            self._inventory_loaded_at = time.monotonic()
+        return inventory
+
+    def _current_inventory(self):
+        inventory = self._fresh_inventory()
+        if inventory is None:
+            # Single-flight: callers waiting on the lock reuse the refresh done by the first one
+            with self._inventory_lock:
+                inventory = self._fresh_inventory() or self.refresh_inventory()
+        return inventory
+
+    def get_all_instances(self, use_cache=True):
+        if not use_cache:
+            with self._inventory_lock:
+                return list(self.refresh_inventory().instances)
+        return list(self._current_inventory().instances)
+
+    def find_instances(self, text):
+        # Every index below comes from the same snapshot, even if a refresh publishes a new one meanwhile
+        inventory = self._current_inventory()
+        text = text.strip().lower()
+        if not text:
+            return []
+        
+        ids, by_id = inventory.search_ids, inventory.by_id
+        matches = {}
+        
+        # ID prefix through binary search; 'i-' may be omitted
+        for prefix in {text, text if text.startswith('i-') else f"i-{text}"}:
+            position = bisect.bisect_left(ids, prefix)
+            while position < len(ids) and ids[position].startswith(prefix):
+                matches[ids[position]] = by_id[ids[position]]
+                position += 1
+        
+        for name, instance in inventory.search_names:
+            if text in name:
+                matches.setdefault(instance['id'], instance)
+        
+        return list(matches.values())
+
+    def _describe_instances(self, instance_ids, region):
+        found = {}
+        paginator = self.clients[region].get_paginator('describe_instances')
+        
+        for page in paginator.paginate(InstanceIds=instance_ids):
+            for reservation in page['Reservations']:
+                for instance in reservation['Instances']:
+                    item = self._to_instance(instance, region)
+                    if item:
+                        found[item['id']] = item
+        
+        return found
+
+    def _describe_region(self, instance_ids, region):
+        found = {}
+        for chunk in self._chunks(instance_ids):
+            try:
+                found.update(self._describe_instances(chunk, region))
+            except ClientError:
+                # Unknown or malformed IDs fail the whole request, so look the chunk up one by one
+                for instance_id in chunk:
+                    try:
+                        found.update(self._describe_instances([instance_id], region))
+                    except ClientError:
+                        pass
+        return found
+
+    def get_instances(self, instance_ids):
+        instance_ids = [i for i in dict.fromkeys(instance_ids) if not self._should_ignore_instance(i)]
+        
+        # The snapshot is read once, so a TTL expiring mid-call cannot leave us with neither inventory nor regions
+        inventory = self._fresh_inventory()
+        if inventory is None:
+            by_region = self._regions_for(instance_ids)
+            # Resolving regions may itself have refreshed the inventory
+            inventory = self._fresh_inventory()
+        if inventory is not None:
+            return {i: inventory.by_id[i] for i in instance_ids if i in inventory.by_id}
+        
+        found = {}
+        for region_found in self._map_regions(lambda region: self._describe_region(by_region[region], region), by_region).values():
+            found.update(region_found)
+        return found
+
+    def get_instance(self, instance_id):
+        return self.get_instances([instance_id]).get(instance_id)
 
     def start_instance(self, instance_id):
         if self._should_ignore_instance(instance_id):
             return False, ""
         
         try:
-            instance = self.ec2.Instance(instance_id)
+            region = next(iter(self._regions_for([instance_id])))
+            instance = self.resources[region].Instance(instance_id)
             instance.load()
             
             if instance.state['Name'] == 'running':
                 return False, f"⚠️ Instance {instance_id} is already running"
             
             instance.start()
+            self.invalidate_cache()
             return True, f"⏳ Starting instance {instance_id}"
         except ClientError as e:
             return False, str(e)
@@ -69,41 +260,138 @@ class EC2Manager:
             return False, ""
         
         try:
-            instance = self.ec2.Instance(instance_id)
+            region = next(iter(self._regions_for([instance_id])))
+            instance = self.resources[region].Instance(instance_id)
             instance.load()
             
             if instance.state['Name'] == 'stopped':
                 return False, f"⚠️ Instance {instance_id} is already stopped"
             
             instance.stop()
+            self.invalidate_cache()
             return True, f"⏳ Stopping Instance {instance_id}"
         except ClientError as e:
             return False, str(e)
 
+    def _chunks(self, items):
+        for i in range(0, len(items), EC2_BATCH_SIZE):
+            yield items[i:i + EC2_BATCH_SIZE]
+
+    def _region_states(self, instance_ids, region):
+        states = {}
+        client = self.clients[region]
+        
+        for chunk in self._chunks(instance_ids):
+            try:
+                paginator = client.get_paginator('describe_instance_status')
+                for page in paginator.paginate(InstanceIds=chunk, IncludeAllInstances=True):
+                    for status in page['InstanceStatuses']:
+                        states[status['InstanceId']] = status['InstanceState']['Name']
+            except ClientError:
+                # An ID that vanished fails the whole request, so poll the chunk one by one
+                for instance_id in chunk:
+                    try:
+                        response = client.describe_instance_status(InstanceIds=[instance_id], IncludeAllInstances=True)
+                        for status in response['InstanceStatuses']:
+                            states[status['InstanceId']] = status['InstanceState']['Name']
+                    except ClientError:
+                        states[instance_id] = 'unknown'
+        
+        return states
+
+    def get_instance_states(self, instance_ids):
+        instance_ids = list(dict.fromkeys(instance_ids))
+        if not instance_ids:
+            return {}
+        
+        by_region = self._regions_for(instance_ids)
+        states = {}
+        for region_states in self._map_regions(lambda region: self._region_states(by_region[region], region), by_region).values():
+            states.update(region_states)
+        return states
+
+    def _batch_region(self, instance_ids, action, region):
+        results = {}
+        client = self.clients[region]
+        
+        if action == 'start':
+            call, response_key, single = client.start_instances, 'StartingInstances', self.start_instance
+        else:
+            call, response_key, single = client.stop_instances, 'StoppingInstances', self.stop_instance
+        
+        for chunk in self._chunks(instance_ids):
+            try:
+                response = call(InstanceIds=chunk)
+            except ClientError:
+                # A single bad ID fails the whole request, so retry this chunk one by one
+                for instance_id in chunk:
+                    results[instance_id] = single(instance_id)
+                continue
+            
+            self.invalidate_cache()
+            for change in response[response_key]:
+                instance_id = change['InstanceId']
+                previous = change['PreviousState']['Name']
+                if action == 'start':
+                    if previous == 'running':
+                        results[instance_id] = (False, f"⚠️ Instance {instance_id} is already running")
+                    else:
+                        results[instance_id] = (True, f"⏳ Starting instance {instance_id}")
+                else:
+                    if previous == 'stopped':
+                        results[instance_id] = (False, f"⚠️ Instance {instance_id} is already stopped")
+                    else:
+                        results[instance_id] = (True, f"⏳ Stopping Instance {instance_id}")
+        
+        return results
+
+    def _batch_action(self, instance_ids, action):
+        instance_ids = [i for i in dict.fromkeys(instance_ids) if not self._should_ignore_instance(i)]
+        if not instance_ids:
+            return {}
+        
+        by_region = self._regions_for(instance_ids)
+        results = {}
+        for region_results in self._map_regions(lambda region: self._batch_region(by_region[region], action, region), by_region).values():
+            results.update(region_results)
+        return results
+
+    def start_instances(self, instance_ids):
+        return self._batch_action(instance_ids, 'start')
+
+    def stop_instances(self, instance_ids):
+        return self._batch_action(instance_ids, 'stop')
+
     def start_all_instances(self):
-        instances = self.get_all_instances()
+        instances = self.get_all_instances(use_cache=False)
         results = []
         
+        to_start = [instance['id'] for instance in instances if instance['state'] == 'stopped']
+        started = self.start_instances(to_start)
+        
         for instance in instances:
-            if instance['state'] == 'stopped':
-                success, message = self.start_instance(instance['id'])
+            if instance['id'] in started:
+                success, message = started[instance['id']]
                 if message:
                     results.append(f"{instance['id']}: {message}")
             elif instance['state'] == 'running':
                 results.append(f"⚠️ {instance['id']}: Instance is already running")
         
-        return results
+        return results, [instance_id for instance_id, (success, message) in started.items() if success]
 
     def stop_all_instances(self):
-        instances = self.get_all_instances()
+        instances = self.get_all_instances(use_cache=False)
         results = []
         
+        to_stop = [instance['id'] for instance in instances if instance['state'] == 'running']
+        stopped = self.stop_instances(to_stop)
+        
         for instance in instances:
-            if instance['state'] == 'running':
-                success, message = self.stop_instance(instance['id'])
+            if instance['id'] in stopped:
+                success, message = stopped[instance['id']]
                 if message:
                     results.append(f"{instance['id']}: {message}")
             elif instance['state'] == 'stopped':
                 results.append(f"⚠️ {instance['id']}: Instance is already stopped")
         
-        return results
\ No newline at end of file
+        return results, [instance_id for instance_id, (success, message) in stopped.items() if success]
@@ -1,10 +1,23 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes, MessageHandler, filters, ConversationHandler
 from aws.ec2_manager import EC2Manager
-from database.postgres import add_schedule, get_schedules, delete_schedule, delete_all_schedules, update_next_schedule_time
-from datetime import datetime, timedelta, time as dt_time
-import pytz
-import re
+from aws.async_ec2_manager import AsyncEC2Manager
+from bot.state_tracker import InstanceStateTracker
+from bot.session_store import create_session_store
+from bot.outbound import OutboundQueue
+from bot.callbacks import router
+from bot import keyboards
+from bot.keyboards import WEEKDAYS
+from database import async_postgres as db
+from metrics import SCHEDULE_LAG_SECONDS, SCHEDULE_ERRORS
+from config import SCHEDULE_COALESCE_SECONDS, SCHEDULE_NODE_ID, SCHEDULE_LEASE_SECONDS, SCHEDULE_MISFIRE_GRACE_SECONDS
+from datetime import datetime, timedelta
+from pytz import UnknownTimeZoneError
+from scheduler.rules import ALL_DAYS, BUSINESS_DAYS, WEEKEND, days_to_mask, mask_to_days, parse_days, format_days, next_occurrence
+from scheduler.engine import plan_catch_up
+from scheduler.coalesce import coalesce, resolve_targets
+from scheduler.window import ScheduleWindow
+from scheduler.timeutils import DEFAULT_TZ, get_timezone, parse_time_input, schedule_timezone, now_utc, as_utc, to_local, format_local
 import os
 import warnings
 
@@ -13,127 +26,192 @@ warnings.filterwarnings("ignore", message="If 'per_message=True'")
 
 SET_TIME = 0
 
-ec2_manager = EC2Manager()
+ec2_manager = AsyncEC2Manager(EC2Manager())
+rastreador = InstanceStateTracker(ec2_manager)
+saida = OutboundQueue()
 AUTHORIZED_GROUP_ID = int(os.getenv('AUTHORIZED_GROUP_ID'))
-user_schedule_data = {}
+sessoes = create_session_store()
+lote_pendente = []
+lote_agendado = False
 
-WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+DAY_PRESETS = {'business': BUSINESS_DAYS, 'weekend': WEEKEND, 'all': ALL_DAYS}
+SCHEDULES_PER_PAGE = 10
+INSTANCES_PER_PAGE = 20
 
 async def verificar_grupo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
     return update.effective_chat.type in ['group', 'supergroup'] and update.effective_chat.id == AUTHORIZED_GROUP_ID
 
 async def executar_agendamento(context: ContextTypes.DEFAULT_TYPE):
-    job = context.job
-    schedule = job.data
+    global lote_agendado
+    
+    # Schedules due in the same tick are gathered and executed together by executar_lote
+    schedule = context.job.data
+    if not schedule.get('catch_up'):
+        SCHEDULE_LAG_SECONDS.observe((now_utc() - as_utc(schedule['schedule_time'])).total_seconds())
+    lote_pendente.append(schedule)
+    if not lote_agendado:
+        lote_agendado = True
+        context.job_queue.run_once(executar_lote, when=SCHEDULE_COALESCE_SECONDS, name='executar_lote')
+
+async def executar_lote(context: ContextTypes.DEFAULT_TYPE):
+    global lote_pendente, lote_agendado
+    
+    schedules, lote_pendente = lote_pendente, []
+    lote_agendado = False
+    if not schedules:
+        return
     
     try:
-        instance_id = schedule['instance_id']
-        action = schedule['action']
+        # Every replica queues the same rows; only the occurrences this node claims are executed here.
+        # Claiming also moves recurring rows to their next time, before any instance is touched.
+        agora = now_utc()
+        proximos = {s['id']: proxima_execucao(s, agora) for s in schedules if not s.get('catch_up')}
+        reivindicados = await db.claim_schedules(
+            [(s['id'], s['schedule_time'], proximos[s['id']]) for s in schedules if not s.get('catch_up')],
+            SCHEDULE_NODE_ID, SCHEDULE_LEASE_SECONDS
+        )
+        schedules = [s for s in schedules if s.get('catch_up') or s['id'] in reivindicados]
+        if not schedules:
+            return
+        # Catch-up runs replay a past occurrence; those rows were already advanced at startup
+        reprogramar_agendamentos(context, [s for s in schedules if not s.get('catch_up')], proximos)
         
-        if instance_id == 'all':
-            if action == 'start':
-                results = ec2_manager.start_all_instances()
-            else:
-                results = ec2_manager.stop_all_instances()
-            
-            if results:
-                mensagem_resultado = f"✅ SCHEDULE EXECUTED!\n\nAction: {action.upper()} ALL\nResults:\n" + "\n".join(results)
-            else:
-                mensagem_resultado = f"✅ SCHEDULE EXECUTED!\n\nAction: {action.upper()} ALL\nNo instances processed."
-        else:
-            if action == 'start':
-                success, result = ec2_manager.start_instance(instance_id)
-            else:
-                success, result = ec2_manager.stop_instance(instance_id)
-            
-            if success:
-                mensagem_resultado = f"✅ SCHEDULE EXECUTED!\n\nInstance: {instance_id}\nAction: {action.upper()}\nStatus: Success"
-            else:
-                mensagem_resultado = f"✅ SCHEDULE EXECUTED!\n\nInstance: {instance_id}\nAction: {action.upper()}\nStatus: {result}"
+        grupos = coalesce(schedules)
+        inventory = []
+        if any(grupo['all'] for grupo in grupos.values()):
+            inventory = await ec2_manager.get_all_instances(use_cache=False)
         
-        await context.bot.send_message(chat_id=AUTHORIZED_GROUP_ID, text=mensagem_resultado)
+        start_ids, stop_ids, conflitos = resolve_targets(grupos, inventory)
+        results = {}
+        if start_ids:
+            results['start'] = await ec2_manager.start_instances(start_ids)
+        if stop_ids:
+            results['stop'] = await ec2_manager.stop_instances(stop_ids)
         
-        dias_semana = schedule.get('dias_semana', '')
-        horario = schedule.get('horario', '')
+        def acompanhar(mensagem):
+            for action, action_results in results.items():
+                rastreador.watch(mensagem, [i for i, (success, _) in action_results.items() if success], action)
         
-        if dias_semana and horario:
-            tz = pytz.timezone('America/Sao_Paulo')
-            agora = datetime.now(tz)
-            
-            proxima_data = None
-            for i in range(1, 366):
-                data_teste = agora + timedelta(days=i)
-                dias_numeros = [int(d) for d in dias_semana.split(',') if d]
-                
-                if data_teste.weekday() in dias_numeros:
-                    proxima_data = data_teste
-                    break
-            
-            if proxima_data:
-                hora, minuto = map(int, horario.split(':'))
-                data_agendamento = datetime.combine(proxima_data.date(), dt_time(hora, minuto))
-                data_agendamento = tz.localize(data_agendamento)
-                data_agendamento_utc = data_agendamento.astimezone(pytz.UTC)
-                
-                if update_next_schedule_time(schedule['id'], data_agendamento_utc):
-                    schedule['schedule_time'] = data_agendamento_utc
-                    
-                    atraso = (data_agendamento_utc - datetime.now(pytz.UTC)).total_seconds()
-                    
-                    if atraso > 0 and context.application and context.application.job_queue:
-                        existing_jobs = context.application.job_queue.get_jobs_by_name(str(schedule['id']))
-                        for existing_job in existing_jobs:
-                            existing_job.schedule_removal()
-                        context.application.job_queue.run_once(
-                            executar_agendamento,
-                            when=atraso,
-                            name=str(schedule['id']),
-                            data=schedule
-                        )
+        # Queued so a burst of schedules stays within Telegram's per-chat limits
+        saida.send(AUTHORIZED_GROUP_ID, montar_resumo_lote(schedules, results, conflitos), on_sent=acompanhar)
         
     except Exception as e:
         print(f"ERROR EXECUTING SCHEDULE: {e}")
-        try:
-            await context.bot.send_message(
-                chat_id=AUTHORIZED_GROUP_ID, 
-                text=f"❌ ERROR EXECUTING SCHEDULE!\n\nError: {str(e)}"
+        SCHEDULE_ERRORS.labels(stage='execute').inc()
+        saida.send(AUTHORIZED_GROUP_ID, f"❌ ERROR EXECUTING SCHEDULE!\n\nError: {str(e)}")
+
+def montar_resumo_lote(schedules, results, conflitos):
+    ids = ', '.join(str(s['id']) for s in schedules if not s.get('catch_up'))
+    mensagem = "✅ SCHEDULE EXECUTED!\n\n"
+    if ids:
+        mensagem += f"Schedules: {ids}\n"
+    
+    atrasados = [s for s in schedules if s.get('catch_up')]
+    if atrasados:
+        mensagem += "⏰ Missed runs: " + ', '.join(
+            f"{s['id']} ({format_local(s['schedule_time'], '%d/%m %H:%M', schedule_timezone(s))})" for s in atrasados
+        ) + "\n"
+    
+    for action, titulo in (('start', '▶️ START'), ('stop', '⏸️ STOP')):
+        if action in results:
+            linhas = [f"{instance_id}: {message}" for instance_id, (success, message) in results[action].items() if message]
+            mensagem += f"\n{titulo}:\n" + ("\n".join(linhas) if linhas else "No instances processed.") + "\n"
+    
+    if conflitos:
+        mensagem += f"\n⚠️ Skipped (start and stop at the same time): {', '.join(conflitos)}\n"
+    
+    if not results and not conflitos:
+        mensagem += "\nNo instances processed."
+    
+    return mensagem[:4000]
+
+def proxima_execucao(schedule, agora):
+    dias_semana = schedule.get('dias_semana', '')
+    horario = schedule.get('horario', '')
+    if not (dias_semana and horario):
+        # One-shot rows keep their time
+        return None
+    
+    # Never compute from before the planned time, so an early wake-up cannot fire twice
+    depois_de = agora
+    planejado = schedule.get('schedule_time')
+    if isinstance(planejado, datetime):
+        depois_de = max(agora, as_utc(planejado))
+    
+    data_agendamento = next_occurrence(parse_days(dias_semana), horario, depois_de, schedule_timezone(schedule))
+    return as_utc(data_agendamento) if data_agendamento else None
+
+def reprogramar_agendamentos(context: ContextTypes.DEFAULT_TYPE, schedules, proximos):
+    # The rows were already moved by claim_schedules; this only queues their next run locally
+    for schedule in schedules:
+        proximo = proximos.get(schedule['id'])
+        if proximo:
+            janela.queue(context.job_queue, {**schedule, 'schedule_time': proximo})
+
+janela = ScheduleWindow(executar_agendamento)
+
+async def recuperar_atrasados(job_queue, carencia=0):
+    agora = now_utc()
+    
+    plano = plan_catch_up(await db.get_overdue_schedules(agora - timedelta(seconds=carencia), agora), agora)
+    # Only the replica whose conditional update moves a row replays its missed runs
+    avancados = await db.advance_overdue_schedules(
+        [(item['schedule']['id'], item['schedule']['schedule_time'], item['next_time']) for item in plano]
+    )
+    
+    runs = 0
+    for item in plano:
+        schedule = item['schedule']
+        if schedule['id'] not in avancados:
+            continue
+        for run_time in item['runs']:
+            job_queue.run_once(
+                executar_agendamento,
+                when=0,
+                name=str(schedule['id']),
+                data={**schedule, 'schedule_time': run_time, 'catch_up': True}
             )
-        except:
-            pass
+            runs += 1
+        janela.queue(job_queue, {**schedule, 'schedule_time': item['next_time']})
+    
+    if avancados:
+        print(f"{len(avancados)} overdue schedules advanced, {runs} missed runs queued.")
 
-def carregar_agendamentos(application: Application):
-    schedules = get_schedules()
-    agora_utc = datetime.now(pytz.UTC)
+async def carregar_agendamentos(context: ContextTypes.DEFAULT_TYPE):
+    job_queue = context.job_queue
     
-    for schedule in schedules:
-        schedule_time = schedule['schedule_time']
-        
-        if isinstance(schedule_time, datetime):
-            if schedule_time.tzinfo is None:
-                schedule_time = pytz.UTC.localize(schedule_time)
-            
-            if schedule_time > agora_utc:
-                atraso = (schedule_time - agora_utc).total_seconds()
-                
-                if atraso > 0:
-                    application.job_queue.run_once(
-                        executar_agendamento,
-                        when=atraso,
-                        name=str(schedule['id']),
-                        data=schedule
-                    )
+    try:
+        await recuperar_atrasados(job_queue)
+    except Exception as e:
+        print(f"ERROR RECOVERING MISSED SCHEDULES: {e}")
+        SCHEDULE_ERRORS.labels(stage='recover').inc()
+    
+    # Advanced rows that fall inside the first window are queued by this refill
+    await recarregar_janela(context, recuperar=False)
+    job_queue.run_repeating(recarregar_janela, interval=janela.refill_interval, first=janela.refill_interval, name='recarregar_janela')
+
+async def recarregar_janela(context: ContextTypes.DEFAULT_TYPE, recuperar=True):
+    try:
+        # Picks up rows left behind by a replica that died holding a lease
+        if recuperar:
+            await recuperar_atrasados(context.job_queue, SCHEDULE_MISFIRE_GRACE_SECONDS)
+        queued = await janela.refill(context.job_queue)
+        if queued:
+            print(f"{queued} schedules queued for the next window.")
+    except Exception as e:
+        print(f"ERROR LOADING SCHEDULE WINDOW: {e}")
+        SCHEDULE_ERRORS.labels(stage='load').inc()
+
+async def limpar_sessoes(context: ContextTypes.DEFAULT_TYPE):
+    removidas = await sessoes.backend.purge_expired()
+    if removidas:
+        print(f"{removidas} expired wizard sessions removed.")
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not await verificar_grupo(update, context):
         return
     
-    keyboard = [
-        [InlineKeyboardButton("Manage Instances", callback_data='manage_instances')],
-        [InlineKeyboardButton("Schedule Tasks", callback_data='schedule_menu')],
-        [InlineKeyboardButton("View Schedules", callback_data='view_schedules')]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.message.reply_text('Choose an option:', reply_markup=reply_markup)
+    await update.message.reply_text('Choose an option:', reply_markup=keyboards.main_menu())
 
 async def start_from_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
@@ -144,13 +222,7 @@ async def start_from_callback(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     await query.answer()
     
-    keyboard = [
-        [InlineKeyboardButton("Manage Instances", callback_data='manage_instances')],
-        [InlineKeyboardButton("Schedule Tasks", callback_data='schedule_menu')],
-        [InlineKeyboardButton("View Schedules", callback_data='view_schedules')]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text('Choose an option:', reply_markup=reply_markup)
+    await query.edit_message_text('Choose an option:', reply_markup=keyboards.main_menu())
 
 async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
@@ -160,163 +232,213 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     await query.answer()
-    data = query.data
-    
-    if data == 'manage_instances':
-        await show_instances_menu(query)
-    elif data == 'schedule_menu':
-        await show_schedule_menu(query)
-    elif data == 'view_schedules':
-        await show_schedules(query)
-    elif data.startswith('instance_'):
-        parts = data.split('_')
-        if len(parts) >= 3:
-            instance_id = '_'.join(parts[1:-1])
-            action = parts[-1]
-            await handle_instance_action(query, instance_id, action)
-    elif data == 'start_all':
-        await start_all_instances(query)
-    elif data == 'stop_all':
-        await stop_all_instances(query)
-    elif data.startswith('schedule_action_'):
-        parts = data.split('_')
-        instance_id = parts[2] if len(parts) > 2 else 'all'
-        action = parts[3]
-        user_id = query.from_user.id
-        user_schedule_data[user_id] = {
-            'instance_id': instance_id,
-            'action': action,
-            'dias_semana': [],
-            'horario': None
-        }
-        await escolher_horario_menu(query)
-    elif data.startswith('delete_schedule_'):
-        schedule_id = int(data.split('_')[2])
-        
-        if context.application and context.application.job_queue:
+    
+    if not await router.dispatch(update, context):
+        # Buttons from before an encoding change, or otherwise unknown
+        await query.edit_message_text("⚠️ This menu is outdated. Send /start to open a new one.")
+
+@router.on('main_menu')
+async def rota_menu_principal(update, context):
+    await start_from_callback(update, context)
+
+@router.on('instances_menu')
+async def rota_menu_instancias(update, context, page=0):
+    await show_instances_menu(update.callback_query, page)
+
+@router.on('schedule_menu')
+async def rota_menu_agendamento(update, context, page=0):
+    await show_schedule_menu(update.callback_query, page)
+
+@router.on('view_schedules')
+async def rota_ver_agendamentos(update, context, page=0):
+    await show_schedules(update.callback_query, page)
+
+@router.on('instance')
+async def rota_instancia(update, context, instance_id, action):
+    await handle_instance_action(update.callback_query, instance_id, action)
+
+@router.on('start_all')
+async def rota_iniciar_todas(update, context):
+    await start_all_instances(update.callback_query)
+
+@router.on('stop_all')
+async def rota_parar_todas(update, context):
+    await stop_all_instances(update.callback_query)
+
+@router.on('schedule_action')
+async def rota_novo_agendamento(update, context, instance_id, action):
+    query = update.callback_query
+    await sessoes.save(query.from_user.id, {
+        'instance_id': instance_id,
+        'action': action,
+        'dias_semana': [],
+        'horario': None
+    })
+    await escolher_horario_menu(query)
+
+@router.on('delete_schedule')
+async def rota_excluir_agendamento(update, context, schedule_id):
+    query = update.callback_query
+    
+    if context.application and context.application.job_queue:
+        jobs = context.application.job_queue.get_jobs_by_name(str(schedule_id))
+        for job in jobs:
+            job.schedule_removal()
+    
+    if await db.delete_schedule(schedule_id, AUTHORIZED_GROUP_ID):
+        await query.edit_message_text(f"✅ Schedule {schedule_id} deleted.")
+    else:
+        await query.edit_message_text("❌ Could not delete.")
+
+@router.on('delete_all_schedules')
+async def rota_excluir_todos(update, context):
+    deleted_ids = await db.delete_all_schedules(AUTHORIZED_GROUP_ID)
+    if context.application and context.application.job_queue:
+        for schedule_id in deleted_ids:
             jobs = context.application.job_queue.get_jobs_by_name(str(schedule_id))
             for job in jobs:
                 job.schedule_removal()
-        
-        if delete_schedule(schedule_id, AUTHORIZED_GROUP_ID):
-            await query.edit_message_text(f"✅ Schedule {schedule_id} deleted.")
-        else:
-            await query.edit_message_text("❌ Could not delete.")
-    elif data == 'delete_all_schedules':
-        schedules = get_schedules(AUTHORIZED_GROUP_ID)
-        if context.application and context.application.job_queue:
-            for schedule in schedules:
-                jobs = context.application.job_queue.get_jobs_by_name(str(schedule['id']))
-                for job in jobs:
-                    job.schedule_removal()
-        
-        count = delete_all_schedules(AUTHORIZED_GROUP_ID)
-        await query.edit_message_text(f"✅ {count} schedules deleted.")
-    elif data == 'back_to_main':
-        await start_from_callback(update, context)
-    elif data == 'digitar_horario':
-        await pedir_horario_digitado(query)
-    elif data == 'voltar_horario':
-        await escolher_horario_menu(query)
-    elif data.startswith('dia_'):
-        await handle_dia_selecionado(query, data)
-    elif data in ['dias_uteis', 'fins_semana', 'todos_dias']:
-        await handle_padrao_dias(query, data)
-    elif data == 'finalizar_dias':
-        await mostrar_resumo_agendamento(query)
-    elif data == 'confirmar_agendamento':
-        await confirmar_agendamento(query, context)
-    elif data == 'cancelar_agendamento':
-        user_id = query.from_user.id
-        if user_id in user_schedule_data:
-            del user_schedule_data[user_id]
-        await start_from_callback(update, context)
-    elif data == 'escolher_horario':
-        await escolher_horario_menu(query)
-    elif data == 'escolher_dias':
-        await escolher_dias_semana_menu(query)
-    elif data == 'voltar_opcoes':
-        user_id = query.from_user.id
-        if user_id in user_schedule_data:
-            dados = user_schedule_data[user_id]
-            await ask_schedule_options(query, dados['instance_id'], dados['action'])
-
-async def show_instances_menu(query):
-    instances = ec2_manager.get_all_instances()
-    keyboard = []
     
-    for instance in instances:
-        keyboard.append([
-            InlineKeyboardButton(f"{instance['name']} ({instance['id']}) - {instance['state']}", callback_data=f"instance_{instance['id']}_details")
-        ])
+    await update.callback_query.edit_message_text(f"✅ {len(deleted_ids)} schedules deleted.")
+
+@router.on('enter_time')
+async def rota_digitar_horario(update, context):
+    await pedir_horario_digitado(update.callback_query)
+
+@router.on('choose_time')
+async def rota_escolher_horario(update, context):
+    await escolher_horario_menu(update.callback_query)
+
+@router.on('choose_days')
+async def rota_escolher_dias(update, context):
+    await escolher_dias_semana_menu(update.callback_query)
+
+@router.on('toggle_day')
+async def rota_dia(update, context, dia_numero):
+    await handle_dia_selecionado(update.callback_query, dia_numero)
+
+@router.on('day_preset')
+async def rota_padrao_dias(update, context, preset):
+    await handle_padrao_dias(update.callback_query, preset)
+
+@router.on('finish_days')
+async def rota_finalizar_dias(update, context):
+    await mostrar_resumo_agendamento(update.callback_query)
+
+@router.on('confirm_schedule')
+async def rota_confirmar(update, context):
+    await confirmar_agendamento(update.callback_query, context)
+
+@router.on('cancel_schedule')
+async def rota_cancelar(update, context):
+    await sessoes.delete(update.callback_query.from_user.id)
+    await start_from_callback(update, context)
+
+@router.on('schedule_options')
+async def rota_opcoes(update, context):
+    query = update.callback_query
+    dados = await sessoes.get(query.from_user.id)
+    if dados:
+        await ask_schedule_options(query, dados['instance_id'], dados['action'])
+
+def paginar(items, page):
+    total_pages = max(1, -(-len(items) // INSTANCES_PER_PAGE))
+    page = min(max(page, 0), total_pages - 1)
+    return items[page * INSTANCES_PER_PAGE:(page + 1) * INSTANCES_PER_PAGE], page, total_pages
+
+def botoes_navegacao(rota, page, total_pages):
+    navegacao = []
+    if page > 0:
+        navegacao.append(InlineKeyboardButton("⬅️ Prev", callback_data=router.encode(rota, page - 1)))
+    if page < total_pages - 1:
+        navegacao.append(InlineKeyboardButton("Next ➡️", callback_data=router.encode(rota, page + 1)))
+    return [navegacao] if navegacao else []
+
+def botao_detalhes(instance):
+    return [InlineKeyboardButton(f"{instance['name']} ({instance['id']}) - {instance['state']}", callback_data=router.encode('instance', instance['id'], 'details'))]
+
+async def show_instances_menu(query, page=0):
+    instances, page, total_pages = paginar(await ec2_manager.get_all_instances(), page)
+    keyboard = [botao_detalhes(instance) for instance in instances]
+    keyboard += botoes_navegacao('instances_menu', page, total_pages)
     
     keyboard.append([
-        InlineKeyboardButton("Start All", callback_data='start_all'),
-        InlineKeyboardButton("Stop All", callback_data='stop_all')
+        InlineKeyboardButton("Start All", callback_data=router.encode('start_all')),
+        InlineKeyboardButton("Stop All", callback_data=router.encode('stop_all'))
     ])
-    keyboard.append([InlineKeyboardButton("Back", callback_data='back_to_main')])
+    keyboard.append([InlineKeyboardButton("Back", callback_data=router.encode('main_menu'))])
     
     reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text('EC2 Instances:', reply_markup=reply_markup)
+    await query.edit_message_text(f'EC2 Instances (page {page + 1}/{total_pages}):\nUse /find <text> to search by name or ID.', reply_markup=reply_markup)
 
-async def show_schedule_menu(query):
-    instances = ec2_manager.get_all_instances()
+async def show_schedule_menu(query, page=0):
+    instances, page, total_pages = paginar(await ec2_manager.get_all_instances(), page)
     keyboard = []
     
     for instance in instances:
         keyboard.append([
-            InlineKeyboardButton(f"📅 {instance['name']}", callback_data=f"schedule_action_{instance['id']}_start"),
-            InlineKeyboardButton(f"🛑 {instance['name']}", callback_data=f"schedule_action_{instance['id']}_stop")
+            InlineKeyboardButton(f"📅 {instance['name']}", callback_data=router.encode('schedule_action', instance['id'], 'start')),
+            InlineKeyboardButton(f"🛑 {instance['name']}", callback_data=router.encode('schedule_action', instance['id'], 'stop'))
         ])
+    keyboard += botoes_navegacao('schedule_menu', page, total_pages)
     
     keyboard.append([
-        InlineKeyboardButton("📅 All - Start", callback_data='schedule_action_all_start'),
-        InlineKeyboardButton("🛑 All - Stop", callback_data='schedule_action_all_stop')
+        InlineKeyboardButton("📅 All - Start", callback_data=router.encode('schedule_action', 'all', 'start')),
+        InlineKeyboardButton("🛑 All - Stop", callback_data=router.encode('schedule_action', 'all', 'stop'))
     ])
-    keyboard.append([InlineKeyboardButton("Back", callback_data='back_to_main')])
+    keyboard.append([InlineKeyboardButton("Back", callback_data=router.encode('main_menu'))])
     
     reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text('Schedule action for:', reply_markup=reply_markup)
+    await query.edit_message_text(f'Schedule action for (page {page + 1}/{total_pages}):', reply_markup=reply_markup)
+
+async def find_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not await verificar_grupo(update, context):
+        return
+    
+    texto = ' '.join(context.args or []).strip()
+    if not texto:
+        await update.message.reply_text("Usage: /find <name or instance ID prefix>")
+        return
+    
+    instances = await ec2_manager.find_instances(texto)
+    if not instances:
+        await update.message.reply_text(f"🔎 No instances match '{texto}'.")
+        return
+    
+    keyboard = [botao_detalhes(instance) for instance in instances[:INSTANCES_PER_PAGE]]
+    keyboard.append([InlineKeyboardButton("Back", callback_data=router.encode('main_menu'))])
+    
+    mensagem = f"🔎 {len(instances)} instances match '{texto}'"
+    if len(instances) > INSTANCES_PER_PAGE:
+        mensagem += f" (showing the first {INSTANCES_PER_PAGE}, refine the search)"
+    await update.message.reply_text(mensagem + ":", reply_markup=InlineKeyboardMarkup(keyboard))
 
 async def ask_schedule_options(query, instance_id, action):
     instance_text = "All instances" if instance_id == 'all' else f"Instance: {instance_id}"
     action_text = "▶️ START" if action == 'start' else "⏸️ STOP"
     
-    keyboard = [
-        [InlineKeyboardButton("⌨️ Enter Time", callback_data='digitar_horario')],
-        [InlineKeyboardButton("📅 Choose Days", callback_data='escolher_dias')],
-        [InlineKeyboardButton("❌ Cancel", callback_data='cancelar_agendamento')]
-    ]
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
     await query.edit_message_text(
         f"📋 Configure Schedule\n{instance_text}\nAction: {action_text}\nConfigure schedule:",
-        reply_markup=reply_markup
+        reply_markup=keyboards.schedule_options_menu()
     )
 
 async def escolher_horario_menu(query):
-    keyboard = [
-        [InlineKeyboardButton("⌨️ Enter Time", callback_data='digitar_horario')],
-        [InlineKeyboardButton("❌ Cancel", callback_data='cancelar_agendamento')]
-    ]
-    
     user_id = query.from_user.id
     instance_text = "All instances"
     action_text = "START"
     
-    if user_id in user_schedule_data:
-        dados = user_schedule_data[user_id]
+    dados = await sessoes.get(user_id)
+    if dados:
         instance_text = "All" if dados['instance_id'] == 'all' else f"Instance: {dados['instance_id']}"
         action_text = "▶️ START" if dados['action'] == 'start' else "⏸️ STOP"
     
     await query.edit_message_text(
         f"⏰ STEP 1: SELECT TIME\n\n{instance_text}\nAction: {action_text}\nClick 'Enter Time' to set time:",
-        reply_markup=InlineKeyboardMarkup(keyboard)
+        reply_markup=keyboards.time_menu()
     )
 
 async def pedir_horario_digitado(query):
-    await query.edit_message_text("⌨️ Enter time (HH:MM):\nExample: 09:30, 14:00\n/cancel to cancel.")
+    await query.edit_message_text(f"⌨️ Enter time (HH:MM), optionally followed by a timezone:\nExample: 09:30, 14:00 Europe/Lisbon\nDefault timezone: {DEFAULT_TZ.zone}\n/cancel to cancel.")
     return SET_TIME
 
 async def handle_horario_digitado(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -327,157 +449,101 @@ async def handle_horario_digitado(update: Update, context: ContextTypes.DEFAULT_
     horario_texto = update.message.text.strip()
     
     if horario_texto.lower() == '/cancel':
-        if user_id in user_schedule_data:
-            del user_schedule_data[user_id]
+        await sessoes.delete(user_id)
         await update.message.reply_text("❌ Canceled.")
         return ConversationHandler.END
     
-    if re.match(r'^(0[0-9]|1[0-9]|2[0-3]):([0-5][0-9])$', horario_texto):
-        hora, minuto = map(int, horario_texto.split(':'))
-        horario = dt_time(hora, minuto)
+    try:
+        horario, tz = parse_time_input(horario_texto)
+    except UnknownTimeZoneError:
+        await update.message.reply_text("❌ Unknown timezone! Example: America/New_York")
+        return SET_TIME
+    except ValueError:
+        await update.message.reply_text("❌ Invalid format! Use HH:MM or HH:MM Area/City")
+        return SET_TIME
+    
+    dados = await sessoes.get(user_id)
+    if dados:
+        dados['horario'] = horario
+        dados['timezone'] = tz.zone
+        await sessoes.save(user_id, dados)
+        await update.message.reply_text(f"✅ Time: {horario_texto}")
         
-        if user_id in user_schedule_data:
-            user_schedule_data[user_id]['horario'] = horario
-            await update.message.reply_text(f"✅ Time: {horario_texto}")
-            
-            await escolher_dias_semana_menu_after_digitado(update, user_id, horario_texto)
-        else:
-            await update.message.reply_text("❌ Session expired.")
+        await escolher_dias_semana_menu_after_digitado(update, user_id)
     else:
-        await update.message.reply_text("❌ Invalid format! Use HH:MM")
-        return SET_TIME
+        await update.message.reply_text("❌ Session expired.")
     
     return ConversationHandler.END
 
-async def escolher_dias_semana_menu_after_digitado(update, user_id, horario_texto):
-    if user_id not in user_schedule_data:
-        await update.message.reply_text("❌ Session expired.")
-        return
-    
-    dados = user_schedule_data[user_id]
-    dias_menu_items = [
-        (WEEKDAYS[0], 0, 'dia_0'),
-        (WEEKDAYS[1], 1, 'dia_1'),
-        (WEEKDAYS[2], 2, 'dia_2'),
-        (WEEKDAYS[3], 3, 'dia_3'),
-        (WEEKDAYS[4], 4, 'dia_4'),
-        (WEEKDAYS[5], 5, 'dia_5'),
-        (WEEKDAYS[6], 6, 'dia_6'),
-    ]
-    
-    keyboard = []
-    for nome_dia, numero_dia, callback in dias_menu_items:
-        emoji = '✅' if numero_dia in dados.get('dias_semana', []) else '⬜'
-        keyboard.append([InlineKeyboardButton(f"{emoji} {nome_dia}", callback_data=callback)])
-    
-    keyboard.append([
-        InlineKeyboardButton("✅ Business Days", callback_data='dias_uteis'),
-        InlineKeyboardButton("🏖️ Weekend", callback_data='fins_semana'),
-        InlineKeyboardButton("📅 All Days", callback_data='todos_dias')
-    ])
-    
-    keyboard.append([
-        InlineKeyboardButton("✅ Finish", callback_data='finalizar_dias'),
-        InlineKeyboardButton("↩️ Back", callback_data='voltar_horario')
-    ])
-    
+def mensagem_dias_semana(dados):
     instance_text = "All" if dados['instance_id'] == 'all' else f"Instance: {dados['instance_id']}"
     action_text = "▶️ START" if dados['action'] == 'start' else "⏸️ STOP"
+    horario_text = f"{dados['horario'].strftime('%H:%M')} ({dados.get('timezone') or DEFAULT_TZ.zone})" if dados['horario'] else "Not set"
+    return f"📅 STEP 2: SELECT DAYS\n\n{instance_text}\nAction: {action_text}\nTime: {horario_text}"
+
+async def escolher_dias_semana_menu_after_digitado(update, user_id):
+    dados = await sessoes.get(user_id)
+    if not dados:
+        await update.message.reply_text("❌ Session expired.")
+        return
     
     await update.message.reply_text(
-        f"📅 STEP 2: SELECT DAYS\n\n{instance_text}\nAction: {action_text}\nTime: {horario_texto}",
-        reply_markup=InlineKeyboardMarkup(keyboard)
+        mensagem_dias_semana(dados),
+        reply_markup=keyboards.weekday_picker(days_to_mask(dados.get('dias_semana', [])))
     )
 
 async def escolher_dias_semana_menu(query):
     user_id = query.from_user.id
     
-    if user_id not in user_schedule_data:
+    dados = await sessoes.get(user_id)
+    if not dados:
         await query.edit_message_text("❌ Session expired.")
         return
     
-    dados = user_schedule_data[user_id]
-    dias_menu_items = [
-        (WEEKDAYS[0], 0, 'dia_0'),
-        (WEEKDAYS[1], 1, 'dia_1'),
-        (WEEKDAYS[2], 2, 'dia_2'),
-        (WEEKDAYS[3], 3, 'dia_3'),
-        (WEEKDAYS[4], 4, 'dia_4'),
-        (WEEKDAYS[5], 5, 'dia_5'),
-        (WEEKDAYS[6], 6, 'dia_6'),
-    ]
-    
-    keyboard = []
-    for nome_dia, numero_dia, callback in dias_menu_items:
-        emoji = '✅' if numero_dia in dados.get('dias_semana', []) else '⬜'
-        keyboard.append([InlineKeyboardButton(f"{emoji} {nome_dia}", callback_data=callback)])
-    
-    keyboard.append([
-        InlineKeyboardButton("✅ Business Days", callback_data='dias_uteis'),
-        InlineKeyboardButton("🏖️ Weekend", callback_data='fins_semana'),
-        InlineKeyboardButton("📅 All Days", callback_data='todos_dias')
-    ])
-    
-    keyboard.append([
-        InlineKeyboardButton("✅ Finish", callback_data='finalizar_dias'),
-        InlineKeyboardButton("↩️ Back", callback_data='voltar_horario')
-    ])
-    
-    instance_text = "All" if dados['instance_id'] == 'all' else f"Instance: {dados['instance_id']}"
-    action_text = "▶️ START" if dados['action'] == 'start' else "⏸️ STOP"
-    horario_text = dados['horario'].strftime("%H:%M") if dados['horario'] else "Not set"
-    
     await query.edit_message_text(
-        f"📅 STEP 2: SELECT DAYS\n\n{instance_text}\nAction: {action_text}\nTime: {horario_text}",
-        reply_markup=InlineKeyboardMarkup(keyboard)
+        mensagem_dias_semana(dados),
+        reply_markup=keyboards.weekday_picker(days_to_mask(dados.get('dias_semana', [])))
     )
 
-async def handle_dia_selecionado(query, data):
+async def handle_dia_selecionado(query, dia_numero):
     user_id = query.from_user.id
     
-    if data.startswith('dia_'):
-        dia_numero = int(data.replace('dia_', ''))
+    dados = await sessoes.get(user_id)
+    if dados:
+        dias = dados.setdefault('dias_semana', [])
         
-        if user_id in user_schedule_data:
-            if 'dias_semana' not in user_schedule_data[user_id]:
-                user_schedule_data[user_id]['dias_semana'] = []
-            
-            dias = user_schedule_data[user_id]['dias_semana']
-            
-            if dia_numero in dias:
-                dias.remove(dia_numero)
-            else:
-                dias.append(dia_numero)
-            
-            await escolher_dias_semana_menu(query)
-
-async def handle_padrao_dias(query, data):
+        if dia_numero in dias:
+            dias.remove(dia_numero)
+        else:
+            dias.append(dia_numero)
+        
+        await sessoes.save(user_id, dados)
+        await escolher_dias_semana_menu(query)
+
+async def handle_padrao_dias(query, preset):
     user_id = query.from_user.id
     
-    if user_id not in user_schedule_data:
+    dados = await sessoes.get(user_id)
+    if not dados:
         await query.edit_message_text("❌ Session expired.")
         return
     
-    if data == 'dias_uteis':
-        user_schedule_data[user_id]['dias_semana'] = [0, 1, 2, 3, 4]
-    elif data == 'fins_semana':
-        user_schedule_data[user_id]['dias_semana'] = [5, 6]
-    elif data == 'todos_dias':
-        user_schedule_data[user_id]['dias_semana'] = list(range(7))
+    dados['dias_semana'] = mask_to_days(DAY_PRESETS[preset])
     
+    await sessoes.save(user_id, dados)
     await mostrar_resumo_agendamento(query)
 
 async def mostrar_resumo_agendamento(query):
     user_id = query.from_user.id
     
-    if user_id not in user_schedule_data:
+    dados = await sessoes.get(user_id)
+    if not dados:
         await query.edit_message_text("❌ Session expired.")
         return
     
-    dados = user_schedule_data[user_id]
     instance_text = "All" if dados['instance_id'] == 'all' else f"Instance: {dados['instance_id']}"
     action_text = "▶️ START" if dados['action'] == 'start' else "⏸️ STOP"
-    horario_text = dados['horario'].strftime("%H:%M") if dados['horario'] else "Not set"
+    horario_text = f"{dados['horario'].strftime('%H:%M')} ({dados.get('timezone') or DEFAULT_TZ.zone})" if dados['horario'] else "Not set"
     
     dias_text = "Not set"
     if dados['dias_semana']:
@@ -485,183 +551,171 @@ async def mostrar_resumo_agendamento(query):
     
     completo = dados['horario'] is not None and len(dados['dias_semana']) > 0
     
-    keyboard = []
-    if not completo:
-        if not dados['horario']:
-            keyboard.append([InlineKeyboardButton("⌨️ Enter Time", callback_data='voltar_horario')])
-        if not dados['dias_semana']:
-            keyboard.append([InlineKeyboardButton("📅 Set Days", callback_data='escolher_dias')])
-    else:
-        keyboard.append([InlineKeyboardButton("✅ CONFIRM", callback_data='confirmar_agendamento')])
-    
-    keyboard.append([
-        InlineKeyboardButton("↩️ Back", callback_data='escolher_dias'),
-        InlineKeyboardButton("❌ Cancel", callback_data='cancelar_agendamento')
-    ])
-    
     status = "✅ READY" if completo else "⚠️ INCOMPLETE"
     
     await query.edit_message_text(
         f"📋 SUMMARY\n{status}\n\n{instance_text}\nAction: {action_text}\nTime: {horario_text}\nDays: {dias_text}",
-        reply_markup=InlineKeyboardMarkup(keyboard)
+        reply_markup=keyboards.summary_menu(dados['horario'] is not None, len(dados['dias_semana']) > 0)
     )
 
 async def confirmar_agendamento(query, context: ContextTypes.DEFAULT_TYPE):
     user_id = query.from_user.id
     
-    if user_id not in user_schedule_data:
+    dados = await sessoes.get(user_id)
+    if not dados:
         await query.edit_message_text("❌ Session expired.")
         return
     
-    dados = user_schedule_data[user_id]
     
     if not dados['horario'] or not dados['dias_semana']:
         await query.edit_message_text("❌ Incomplete configuration!")
         return
     
-    tz = pytz.timezone('America/Sao_Paulo')
-    agora = datetime.now(tz)
+    tz = get_timezone(dados.get('timezone'))
+    agora = now_utc()
     
     group_id = AUTHORIZED_GROUP_ID
-
-    for i in range(8):
-        data_teste = agora + timedelta(days=i)
-        if data_teste.weekday() in dados['dias_semana']:
-            data_agendamento = datetime.combine(data_teste.date(), dados['horario'])
-            data_agendamento = tz.localize(data_agendamento)
-
-            if data_agendamento <= agora:
-                continue
-            
-            data_agendamento_utc = data_agendamento.astimezone(pytz.UTC)
-            
-            schedule_id = add_schedule(
-                group_id=group_id,
-                instance_id=dados['instance_id'],
-                action=dados['action'],
-                schedule_time=data_agendamento_utc,
-                dias_semana=','.join(map(str, dados['dias_semana'])),
-                horario=dados['horario'].strftime("%H:%M")
-            )
-            
-            schedule_data = {
-                'id': schedule_id,
-                'chat_id': group_id,
-                'instance_id': dados['instance_id'],
-                'action': dados['action'],
-                'dias_semana': ','.join(map(str, dados['dias_semana'])),
-                'horario': dados['horario'].strftime("%H:%M")
-            }
-            
-            atraso = (data_agendamento_utc - datetime.now(pytz.UTC)).total_seconds()
-            
-            if atraso > 0 and context.application and context.application.job_queue:
-                context.application.job_queue.run_once(
-                    executar_agendamento,
-                    when=atraso,
-                    name=str(schedule_id),
-                    data=schedule_data
-                )
-            
-            del user_schedule_data[user_id]
-            
-            data_formatada = data_agendamento.strftime("%d/%m/%Y at %H:%M")
-            dias_text = ', '.join([WEEKDAYS[d] for d in dados['dias_semana']])
-            
-            await query.edit_message_text(
-                f"✅ SCHEDULE CONFIRMED!\n\n"
-                f"📋 Details:\n"
-                f"• {'All' if dados['instance_id'] == 'all' else 'Instance: ' + dados['instance_id']}\n"
-                f"• Action: {'START' if dados['action'] == 'start' else 'STOP'}\n"
-                f"• Time: {dados['horario'].strftime('%H:%M')}\n"
-                f"• Days: {dias_text}\n"
-                f"• Next execution: {data_formatada}\n\n"
-                f"ID: {schedule_id}\n\n"
-                f"✅ You will be notified on the group when executed!"
-            )
-            return
+    mask = days_to_mask(dados['dias_semana'])
+    dias_semana = format_days(mask)
+    
+    data_agendamento = next_occurrence(mask, dados['horario'], agora, tz)
+    if not data_agendamento:
+        await query.edit_message_text("❌ Error calculating date.")
+        return
+    
+    data_agendamento_utc = as_utc(data_agendamento)
+    
+    schedule_id = await db.add_schedule(
+        group_id=group_id,
+        instance_id=dados['instance_id'],
+        action=dados['action'],
+        schedule_time=data_agendamento_utc,
+        dias_semana=dias_semana,
+        horario=dados['horario'].strftime("%H:%M"),
+        timezone=tz.zone
+    )
+    
+    schedule_data = {
+        'id': schedule_id,
+        'chat_id': group_id,
+        'instance_id': dados['instance_id'],
+        'action': dados['action'],
+        'schedule_time': data_agendamento_utc,
+        'dias_semana': dias_semana,
+        'horario': dados['horario'].strftime("%H:%M"),
+        'timezone': tz.zone
+    }
     
-    await query.edit_message_text("❌ Error calculating date.")
+    if context.application and context.application.job_queue:
+        janela.queue(context.application.job_queue, schedule_data)
+    
+    await sessoes.delete(user_id)
+    
+    data_formatada = data_agendamento.strftime("%d/%m/%Y at %H:%M")
+    dias_text = ', '.join([WEEKDAYS[d] for d in mask_to_days(mask)])
+    
+    await query.edit_message_text(
+        f"✅ SCHEDULE CONFIRMED!\n\n"
+        f"📋 Details:\n"
+        f"• {'All' if dados['instance_id'] == 'all' else 'Instance: ' + dados['instance_id']}\n"
+        f"• Action: {'START' if dados['action'] == 'start' else 'STOP'}\n"
+        f"• Time: {dados['horario'].strftime('%H:%M')} ({tz.zone})\n"
+        f"• Days: {dias_text}\n"
+        f"• Next execution: {data_formatada}\n\n"
+        f"ID: {schedule_id}\n\n"
+        f"✅ You will be notified on the group when executed!"
+    )
 
 async def handle_instance_action(query, instance_id, action):
-    if action == 'start':
-        success, message = ec2_manager.start_instance(instance_id)
-        await query.edit_message_text(message)
-    elif action == 'stop':
-        success, message = ec2_manager.stop_instance(instance_id)
-        await query.edit_message_text(message)
+    if action in ('start', 'stop'):
+        if action == 'start':
+            success, message = await ec2_manager.start_instance(instance_id)
+        else:
+            success, message = await ec2_manager.stop_instance(instance_id)
+        mensagem = await query.edit_message_text(message)
+        if success:
+            rastreador.watch(mensagem, [instance_id], action)
     elif action == 'details':
-        instances = ec2_manager.get_all_instances()
-        instance = next((i for i in instances if i['id'] == instance_id), None)
+        instance = await ec2_manager.get_instance(instance_id)
         
         if instance:
             keyboard = [
                 [
-                    InlineKeyboardButton("▶️ Start", callback_data=f"instance_{instance_id}_start"),
-                    InlineKeyboardButton("⏸️ Stop", callback_data=f"instance_{instance_id}_stop")
+                    InlineKeyboardButton("▶️ Start", callback_data=router.encode('instance', instance_id, 'start')),
+                    InlineKeyboardButton("⏸️ Stop", callback_data=router.encode('instance', instance_id, 'stop'))
                 ],
-                [InlineKeyboardButton("Back", callback_data='manage_instances')]
+                [InlineKeyboardButton("Back", callback_data=router.encode('instances_menu'))]
             ]
             await query.edit_message_text(
-                f"Instance: {instance['name']}\nID: {instance_id}\nState: {instance['state']}",
+                f"Instance: {instance['name']}\nID: {instance_id}\nRegion: {instance['region']}\nState: {instance['state']}",
                 reply_markup=InlineKeyboardMarkup(keyboard)
             )
 
 async def start_all_instances(query):
-    results = ec2_manager.start_all_instances()
+    results, started = await ec2_manager.start_all_instances()
     message = "Results:\n" + "\n".join(results) if results else "No instances to start."
-    await query.edit_message_text(message[:4000])
+    mensagem = await query.edit_message_text(message[:4000])
+    rastreador.watch(mensagem, started, 'start')
 
 async def stop_all_instances(query):
-    results = ec2_manager.stop_all_instances()
+    results, stopped = await ec2_manager.stop_all_instances()
     message = "Results:\n" + "\n".join(results) if results else "No instances to stop."
-    await query.edit_message_text(message[:4000])
+    mensagem = await query.edit_message_text(message[:4000])
+    rastreador.watch(mensagem, stopped, 'stop')
 
-async def show_schedules(query):
+async def show_schedules(query, page=0):
     group_id = AUTHORIZED_GROUP_ID
-    schedules = get_schedules(group_id)
+    schedules, has_next = await db.get_schedules_page(group_id, SCHEDULES_PER_PAGE, page * SCHEDULES_PER_PAGE)
+    
+    # The page may have emptied after deletions
+    if not schedules and page > 0:
+        page = 0
+        schedules, has_next = await db.get_schedules_page(group_id, SCHEDULES_PER_PAGE, 0)
     
     if not schedules:
-        keyboard = [
-            [InlineKeyboardButton("↩️ Back", callback_data='back_to_main')]
-        ]
-        await query.edit_message_text("📭 No schedules found.", reply_markup=InlineKeyboardMarkup(keyboard))
+        await query.edit_message_text("📭 No schedules found.", reply_markup=keyboards.back_to_main())
         return
     
-    message = "📅 SCHEDULES:\n\n"
+    linhas = [f"📅 SCHEDULES (page {page + 1}):\n"]
     
     for schedule in schedules:
-        schedule_time = schedule['schedule_time']
-        if isinstance(schedule_time, datetime) and schedule_time.tzinfo is None:
-            schedule_time = pytz.UTC.localize(schedule_time)
-        
-        schedule_time_local = schedule_time.astimezone(pytz.timezone('America/Sao_Paulo'))
+        schedule_tz = schedule_timezone(schedule)
+        schedule_time_local = to_local(schedule['schedule_time'], schedule_tz)
         horario_agendamento = schedule['horario'] if 'horario' in schedule and schedule['horario'] else schedule_time_local.strftime('%H:%M')
         
         dias_text = ""
         if 'dias_semana' in schedule and schedule['dias_semana']:
             try:
-                dias_numeros = [int(d) for d in schedule['dias_semana'].split(',') if d]
-                dias_text = f"\n• Days: {', '.join([WEEKDAYS[d] for d in dias_numeros])}"
-            except:
+                dias_text = f"• Days: {', '.join([WEEKDAYS[d] for d in mask_to_days(parse_days(schedule['dias_semana']))])}\n"
+            except ValueError:
                 pass
         
-        message += f"🆔 ID: {schedule['id']}\n"
-        message += f"• Instance: {schedule['instance_id']}\n"
-        message += f"• Action: {schedule['action'].upper()}\n"
-        message += f"• Time: {horario_agendamento}\n"
-        if dias_text:
-            message += dias_text
-        message += f"• Next: {schedule_time_local.strftime('%d/%m')}\n"
-        message += "-" * 30 + "\n"
+        linhas.append(
+            f"🆔 ID: {schedule['id']}\n"
+            f"• Instance: {schedule['instance_id']}\n"
+            f"• Action: {schedule['action'].upper()}\n"
+            f"• Time: {horario_agendamento} ({schedule_tz.zone})\n"
+            f"{dias_text}"
+            f"• Next: {schedule_time_local.strftime('%d/%m')}\n"
+            + "-" * 30
+        )
+    message = "\n".join(linhas)
     
     keyboard = []
     for schedule in schedules:
-        keyboard.append([InlineKeyboardButton(f"🗑️ Delete {schedule['id']}", callback_data=f"delete_schedule_{schedule['id']}")])
+        keyboard.append([InlineKeyboardButton(f"🗑️ Delete {schedule['id']}", callback_data=router.encode('delete_schedule', schedule['id']))])
+    
+    navegacao = []
+    if page > 0:
+        navegacao.append(InlineKeyboardButton("⬅️ Prev", callback_data=router.encode('view_schedules', page - 1)))
+    if has_next:
+        navegacao.append(InlineKeyboardButton("Next ➡️", callback_data=router.encode('view_schedules', page + 1)))
+    if navegacao:
+        keyboard.append(navegacao)
     
     keyboard.append([
-        InlineKeyboardButton("🗑️ Delete All", callback_data='delete_all_schedules'),
-        InlineKeyboardButton("↩️ Back", callback_data='back_to_main')
+        InlineKeyboardButton("🗑️ Delete All", callback_data=router.encode('delete_all_schedules')),
+        InlineKeyboardButton("↩️ Back", callback_data=router.encode('main_menu'))
     ])
     
     await query.edit_message_text(message, reply_markup=InlineKeyboardMarkup(keyboard))
@@ -673,16 +727,30 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
     user_id = update.message.from_user.id
     text = update.message.text.strip()
     
-    if user_id in user_schedule_data and not text.startswith('/'):
-        if 'horario' not in user_schedule_data[user_id] or not user_schedule_data[user_id]['horario']:
-            await handle_horario_digitado(update, context)
+    if text.startswith('/'):
+        return
+    
+    dados = await sessoes.get(user_id)
+    if dados and not dados.get('horario'):
+        await handle_horario_digitado(update, context)
+
+async def on_stop(application: Application):
+    # The bot can still send while stopping; by post_shutdown its connection is closed
+    await saida.stop()
+
+async def on_shutdown(application: Application):
+    await rastreador.stop()
+    await db.close_pool()
+    ec2_manager.shutdown()
 
 def setup_handlers(application: Application):
+    saida.bot = application.bot
     application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("find", find_command))
     application.add_handler(CallbackQueryHandler(button_handler))
     
     conv_handler = ConversationHandler(
-        entry_points=[CallbackQueryHandler(pedir_horario_digitado, pattern='^digitar_horario$')],
+        entry_points=[CallbackQueryHandler(pedir_horario_digitado, pattern=router.pattern('enter_time'))],
         states={
             SET_TIME: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_horario_digitado)]
         },
@@ -692,4 +760,6 @@ def setup_handlers(application: Application):
     application.add_handler(conv_handler)
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text_message))
     
-    carregar_agendamentos(application)
\ No newline at end of file
+    application.job_queue.run_once(carregar_agendamentos, when=0, name='carregar_agendamentos')
+    if sessoes.backend is not None:
+        application.job_queue.run_repeating(limpar_sessoes, interval=sessoes.ttl, first=sessoes.ttl, name='limpar_sessoes')
\ No newline at end of file
@@ -0,0 +1,124 @@
+import re
+import time
+from metrics import CALLBACK_SECONDS, CALLBACK_ERRORS
+
+# Bumped whenever the encoding changes, so buttons from older messages are recognised as stale
+CALLBACK_VERSION = '1'
+SEPARATOR = ':'
+# Telegram rejects callback_data longer than this
+MAX_CALLBACK_BYTES = 64
+
+def page(value):
+    number = int(value)
+    if number < 0:
+        raise ValueError(f"Invalid page: {value}")
+    return number
+
+def action(value):
+    if value not in ('start', 'stop'):
+        raise ValueError(f"Unknown action: {value}")
+    return value
+
+def instance_action(value):
+    return value if value == 'details' else action(value)
+
+def weekday(value):
+    day = int(value)
+    if not 0 <= day <= 6:
+        raise ValueError(f"Invalid weekday: {value}")
+    return day
+
+def day_preset(value):
+    if value not in ('business', 'weekend', 'all'):
+        raise ValueError(f"Unknown day preset: {value}")
+    return value
+
+# name: (code, argument types). Codes are part of the wire format and must stay unique.
+# A trailing page argument may be left out and defaults to the first page.
+ROUTES = {
+    'main_menu': ('m', ()),
+    'instances_menu': ('im', (page,)),
+    'schedule_menu': ('sm', (page,)),
+    'view_schedules': ('vs', (page,)),
+    'instance': ('i', (str, instance_action)),
+    'start_all': ('sa', ()),
+    'stop_all': ('xa', ()),
+    'schedule_action': ('sn', (str, action)),
+    'delete_schedule': ('ds', (int,)),
+    'delete_all_schedules': ('da', ()),
+    'enter_time': ('et', ()),
+    'choose_time': ('ct', ()),
+    'choose_days': ('cd', ()),
+    'toggle_day': ('td', (weekday,)),
+    'day_preset': ('dp', (day_preset,)),
+    'finish_days': ('fd', ()),
+    'confirm_schedule': ('ok', ()),
+    'cancel_schedule': ('cx', ()),
+    'schedule_options': ('so', ()),
+}
+
+class CallbackRouter:
+    # Maps compact "version:code:arg..." callback_data to handlers with typed arguments
+
+    def __init__(self, routes=ROUTES, version=CALLBACK_VERSION):
+        self.version = version
+        self.codes = {name: code for name, (code, _) in routes.items()}
+        if len(set(self.codes.values())) != len(self.codes):
+            raise ValueError("Duplicate callback codes")
+        # code -> [handler, argument types, required argument count], handlers filled in by on()
+        self.routes = {code: [None, types, sum(1 for t in types if t is not page)] for code, types in routes.values()}
+
+    def on(self, name):
+        def decorator(handler):
+            self.routes[self.codes[name]][0] = self._timed(name, handler)
+            return handler
+        return decorator
+
+    def _timed(self, name, handler):
+        histogram = CALLBACK_SECONDS.labels(route=name)
+        errors = CALLBACK_ERRORS.labels(route=name)
+
+        async def timed_handler(*args):
+            started = time.perf_counter()
+            try:
+                return await handler(*args)
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - started)
+        return timed_handler
+
+    def encode(self, name, *args):
+        data = SEPARATOR.join([self.version, self.codes[name], *map(str, args)])
+        if len(data.encode()) > MAX_CALLBACK_BYTES:
+            raise ValueError(f"Callback data too long: {data}")
+        return data
+
+    def pattern(self, name):
+        # Regex for handlers that filter on a single argument-less route, e.g. ConversationHandler entry points
+        return f"^{re.escape(self.encode(name))}$"
+
+    def decode(self, data):
+        parts = (data or '').split(SEPARATOR)
+        if len(parts) < 2 or parts[0] != self.version or parts[1] not in self.routes:
+            return None
+
+        handler, types, required = self.routes[parts[1]]
+        args = parts[2:]
+        if handler is None or not required <= len(args) <= len(types):
+            return None
+        try:
+            return handler, [convert(arg) for convert, arg in zip(types, args)]
+        except ValueError:
+            return None
+
+    async def dispatch(self, update, context):
+        decoded = self.decode(update.callback_query.data)
+        if decoded is None:
+            return False
+        handler, args = decoded
+        await handler(update, context, *args)
+        return True
+
+router = CallbackRouter()
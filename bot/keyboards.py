@@ -0,0 +1,69 @@
+from functools import lru_cache
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from bot.callbacks import router
+
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+# Telegram objects are immutable once built, so one instance of each menu can be shared by every message
+
+@lru_cache(maxsize=None)
+def main_menu():
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("Manage Instances", callback_data=router.encode('instances_menu'))],
+        [InlineKeyboardButton("Schedule Tasks", callback_data=router.encode('schedule_menu'))],
+        [InlineKeyboardButton("View Schedules", callback_data=router.encode('view_schedules'))]
+    ])
+
+@lru_cache(maxsize=None)
+def back_to_main():
+    return InlineKeyboardMarkup([[InlineKeyboardButton("↩️ Back", callback_data=router.encode('main_menu'))]])
+
+@lru_cache(maxsize=None)
+def schedule_options_menu():
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("⌨️ Enter Time", callback_data=router.encode('enter_time'))],
+        [InlineKeyboardButton("📅 Choose Days", callback_data=router.encode('choose_days'))],
+        [InlineKeyboardButton("❌ Cancel", callback_data=router.encode('cancel_schedule'))]
+    ])
+
+@lru_cache(maxsize=None)
+def time_menu():
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("⌨️ Enter Time", callback_data=router.encode('enter_time'))],
+        [InlineKeyboardButton("❌ Cancel", callback_data=router.encode('cancel_schedule'))]
+    ])
+
+# One variant per 7-bit weekday selection
+@lru_cache(maxsize=128)
+def weekday_picker(mask):
+    keyboard = [
+        [InlineKeyboardButton(f"{'✅' if mask >> day & 1 else '⬜'} {nome_dia}", callback_data=router.encode('toggle_day', day))]
+        for day, nome_dia in enumerate(WEEKDAYS)
+    ]
+    keyboard.append([
+        InlineKeyboardButton("✅ Business Days", callback_data=router.encode('day_preset', 'business')),
+        InlineKeyboardButton("🏖️ Weekend", callback_data=router.encode('day_preset', 'weekend')),
+        InlineKeyboardButton("📅 All Days", callback_data=router.encode('day_preset', 'all'))
+    ])
+    keyboard.append([
+        InlineKeyboardButton("✅ Finish", callback_data=router.encode('finish_days')),
+        InlineKeyboardButton("↩️ Back", callback_data=router.encode('choose_time'))
+    ])
+    return InlineKeyboardMarkup(keyboard)
+
+@lru_cache(maxsize=4)
+def summary_menu(tem_horario, tem_dias):
+    keyboard = []
+    if tem_horario and tem_dias:
+        keyboard.append([InlineKeyboardButton("✅ CONFIRM", callback_data=router.encode('confirm_schedule'))])
+    else:
+        if not tem_horario:
+            keyboard.append([InlineKeyboardButton("⌨️ Enter Time", callback_data=router.encode('choose_time'))])
+        if not tem_dias:
+            keyboard.append([InlineKeyboardButton("📅 Set Days", callback_data=router.encode('choose_days'))])
+
+    keyboard.append([
+        InlineKeyboardButton("↩️ Back", callback_data=router.encode('choose_days')),
+        InlineKeyboardButton("❌ Cancel", callback_data=router.encode('cancel_schedule'))
+    ])
+    return InlineKeyboardMarkup(keyboard)
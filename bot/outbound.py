@@ -0,0 +1,134 @@
+import asyncio
+from collections import deque
+from telegram.error import RetryAfter, BadRequest, Forbidden, TelegramError
+from config import OUTBOUND_RATE_PER_MINUTE, OUTBOUND_BURST, OUTBOUND_MAX_RETRIES, OUTBOUND_FLUSH_TIMEOUT
+from metrics import NOTIFICATIONS_DROPPED
+
+MAX_MESSAGE_LENGTH = 4000
+SEPARATOR = "\n\n"
+
+class OutboundQueue:
+    # Sends notifications through a token bucket per chat; texts waiting for the same chat go out as one message
+
+    def __init__(self, bot=None, rate_per_minute=OUTBOUND_RATE_PER_MINUTE, burst=OUTBOUND_BURST, max_retries=OUTBOUND_MAX_RETRIES):
+        self.bot = bot
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.max_retries = max_retries
+        # chat_id -> deque of (text, on_sent)
+        self.pending = {}
+        # chat_id -> {'tokens', 'updated', 'blocked_until', 'failures'}
+        self.buckets = {}
+        self._task = None
+        self._wake = asyncio.Event()
+
+    def send(self, chat_id, text, on_sent=None):
+        # on_sent receives the delivered Message, which may also carry other merged notifications
+        self.pending.setdefault(chat_id, deque()).append((text[:MAX_MESSAGE_LENGTH], on_sent))
+        self._wake.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout=OUTBOUND_FLUSH_TIMEOUT):
+        if self._task is None or self._task.done():
+            return
+        # Gives queued notifications a chance to go out before the bot goes down
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=timeout)
+        except asyncio.TimeoutError:
+            dropped = sum(len(items) for items in self.pending.values())
+            print(f"Outbound queue stopped with {dropped} notifications not sent.")
+            NOTIFICATIONS_DROPPED.labels(reason='shutdown').inc(dropped)
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def _bucket(self, chat_id, now):
+        bucket = self.buckets.setdefault(chat_id, {'tokens': self.burst, 'updated': now, 'blocked_until': 0, 'failures': 0})
+        bucket['tokens'] = min(self.burst, bucket['tokens'] + (now - bucket['updated']) * self.rate)
+        bucket['updated'] = now
+        return bucket
+
+    def _wait_time(self, chat_id, now):
+        bucket = self._bucket(chat_id, now)
+        if now < bucket['blocked_until']:
+            return bucket['blocked_until'] - now
+        return 0 if bucket['tokens'] >= 1 else (1 - bucket['tokens']) / self.rate
+
+    def _take(self, chat_id):
+        # Everything queued for the chat that fits in one message
+        items = self.pending[chat_id]
+        batch = [items.popleft()]
+        size = len(batch[0][0])
+        while items and size + len(SEPARATOR) + len(items[0][0]) <= MAX_MESSAGE_LENGTH:
+            size += len(SEPARATOR) + len(items[0][0])
+            batch.append(items.popleft())
+        return batch
+
+    def _requeue(self, chat_id, batch):
+        self.pending.setdefault(chat_id, deque()).extendleft(reversed(batch))
+
+    async def _deliver(self, chat_id):
+        batch = self._take(chat_id)
+        bucket = self.buckets[chat_id]
+        bucket['tokens'] -= 1
+
+        try:
+            message = await self.bot.send_message(chat_id=chat_id, text=SEPARATOR.join(text for text, _ in batch))
+        except RetryAfter as e:
+            now = asyncio.get_running_loop().time()
+            bucket['blocked_until'] = now + e.retry_after
+            self._requeue(chat_id, batch)
+            return
+        except (BadRequest, Forbidden) as e:
+            # Retrying would fail the same way
+            print(f"Dropping {len(batch)} notifications for chat {chat_id}: {e}")
+            NOTIFICATIONS_DROPPED.labels(reason='rejected').inc(len(batch))
+            return
+        except TelegramError as e:
+            now = asyncio.get_running_loop().time()
+            bucket['failures'] += 1
+            if bucket['failures'] > self.max_retries:
+                print(f"Dropping {len(batch)} notifications for chat {chat_id} after {self.max_retries} retries: {e}")
+                NOTIFICATIONS_DROPPED.labels(reason='retries').inc(len(batch))
+                bucket['failures'] = 0
+                return
+            bucket['blocked_until'] = now + min(2 ** bucket['failures'], 60)
+            self._requeue(chat_id, batch)
+            return
+
+        bucket['failures'] = 0
+        for _, on_sent in batch:
+            if on_sent:
+                try:
+                    on_sent(message)
+                except Exception as e:
+                    print(f"Error after sending notification: {e}")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            self._wake.clear()
+            for chat_id in [c for c, items in self.pending.items() if not items]:
+                del self.pending[chat_id]
+            if not self.pending:
+                return
+
+            wait = None
+            for chat_id in list(self.pending):
+                now = loop.time()
+                chat_wait = self._wait_time(chat_id, now)
+                if chat_wait <= 0:
+                    await self._deliver(chat_id)
+                    chat_wait = self._wait_time(chat_id, loop.time()) if self.pending[chat_id] else None
+                if chat_wait is not None:
+                    wait = chat_wait if wait is None else min(wait, chat_wait)
+
+            if wait:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
@@ -0,0 +1,96 @@
+import json
+import time
+from collections import OrderedDict
+from datetime import time as dt_time
+from config import SESSION_TTL_SECONDS, SESSION_MAX_ENTRIES, SESSION_BACKEND
+from database import async_postgres as db
+
+def _encode(value):
+    if isinstance(value, dt_time):
+        return {'__time__': value.strftime('%H:%M')}
+    raise TypeError(f"Cannot store {type(value).__name__} in a session")
+
+def _decode(obj):
+    if '__time__' in obj:
+        hora, minuto = map(int, obj['__time__'].split(':'))
+        return dt_time(hora, minuto)
+    return obj
+
+class PostgresSessionBackend:
+    # Keeps wizard sessions in the wizard_sessions table so they survive restarts
+
+    async def load(self, user_id):
+        raw = await db.get_session(user_id)
+        return json.loads(raw, object_hook=_decode) if raw else None
+
+    async def save(self, user_id, data, ttl):
+        await db.save_session(user_id, json.dumps(data, default=_encode), ttl)
+
+    async def delete(self, user_id):
+        await db.delete_session(user_id)
+
+    async def purge_expired(self):
+        return await db.delete_expired_sessions()
+
+class SessionStore:
+    # In-memory LRU with TTL eviction, optionally written through to a persistent backend
+
+    def __init__(self, ttl=SESSION_TTL_SECONDS, max_entries=SESSION_MAX_ENTRIES, backend=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.backend = backend
+        self._sessions = OrderedDict()
+
+    def _evict(self):
+        now = time.monotonic()
+        # Entries are kept in access order, so expired ones sit at the front
+        while self._sessions:
+            user_id, (expires_at, _) = next(iter(self._sessions.items()))
+            if expires_at > now and len(self._sessions) <= self.max_entries:
+                break
+            self._sessions.popitem(last=False)
+
+    async def get(self, user_id):
+        entry = self._sessions.get(user_id)
+        if entry and entry[0] > time.monotonic():
+            # Sliding expiry keeps access order and expiry order the same
+            self._remember(user_id, entry[1])
+            return entry[1]
+
+        self._sessions.pop(user_id, None)
+        if self.backend is None:
+            return None
+
+        try:
+            data = await self.backend.load(user_id)
+        except Exception as e:
+            print(f"Error loading session {user_id}: {e}")
+            return None
+        if data is not None:
+            self._remember(user_id, data)
+        return data
+
+    def _remember(self, user_id, data):
+        self._sessions[user_id] = (time.monotonic() + self.ttl, data)
+        self._sessions.move_to_end(user_id)
+        self._evict()
+
+    async def save(self, user_id, data):
+        self._remember(user_id, data)
+        if self.backend is not None:
+            try:
+                await self.backend.save(user_id, data, self.ttl)
+            except Exception as e:
+                print(f"Error saving session {user_id}: {e}")
+
+    async def delete(self, user_id):
+        self._sessions.pop(user_id, None)
+        if self.backend is not None:
+            try:
+                await self.backend.delete(user_id)
+            except Exception as e:
+                print(f"Error deleting session {user_id}: {e}")
+
+def create_session_store():
+    backend = PostgresSessionBackend() if SESSION_BACKEND == 'postgres' else None
+    return SessionStore(backend=backend)
@@ -0,0 +1,106 @@
+import asyncio
+from telegram.error import TelegramError
+from config import EC2_WAITER_MIN_INTERVAL, EC2_WAITER_MAX_INTERVAL, EC2_WAITER_TIMEOUT
+
+ACTION_TARGETS = {'start': 'running', 'stop': 'stopped'}
+# States from which the target can no longer be reached
+DEAD_STATES = {'terminated', 'shutting-down', 'unknown'}
+
+class InstanceStateTracker:
+    # One poll loop for every instance waiting on a start/stop, reporting by editing the original message
+
+    def __init__(self, ec2_manager, min_interval=EC2_WAITER_MIN_INTERVAL, max_interval=EC2_WAITER_MAX_INTERVAL, timeout=EC2_WAITER_TIMEOUT):
+        self.ec2_manager = ec2_manager
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.timeout = timeout
+        self.watches = []
+        self._task = None
+        self._wake = asyncio.Event()
+
+    def watch(self, message, instance_ids, action, header=None):
+        instance_ids = list(dict.fromkeys(instance_ids))
+        if not instance_ids or message is None or message is True:
+            return
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        # A message reporting several actions (or merged notifications) gets one watch, so edits do not overwrite each other
+        watch = next((w for w in self.watches if w['message'] is message), None)
+        if watch is None:
+            watch = {'message': message, 'targets': {}, 'states': {}, 'header': header if header is not None else message.text, 'deadline': deadline}
+            self.watches.append(watch)
+        watch['deadline'] = max(watch['deadline'], deadline)
+        for instance_id in instance_ids:
+            watch['targets'][instance_id] = ACTION_TARGETS[action]
+            watch['states'][instance_id] = 'pending' if action == 'start' else 'stopping'
+
+        # New work restarts the backoff
+        self._wake.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def _settled(self, state, target):
+        # Describe calls are eventually consistent, so anything else is polled again until the deadline
+        return state == target or state in DEAD_STATES
+
+    def _is_done(self, watch):
+        return all(self._settled(state, watch['targets'][i]) for i, state in watch['states'].items())
+
+    def _render(self, watch, timed_out=False):
+        lines = []
+        for instance_id, state in watch['states'].items():
+            if state == watch['targets'][instance_id]:
+                lines.append(f"✅ {instance_id}: {state}")
+            elif timed_out and not self._settled(state, watch['targets'][instance_id]):
+                lines.append(f"⌛ {instance_id}: still {state}")
+            else:
+                lines.append(f"⚠️ {instance_id}: {state}")
+        status = "\n\nFinal state:\n" + "\n".join(lines)
+        return watch['header'][:max(0, 4000 - len(status))] + status
+
+    async def _finish(self, watch, timed_out=False):
+        try:
+            await watch['message'].edit_text(self._render(watch, timed_out)[:4000])
+        except TelegramError as e:
+            print(f"Could not update instance state message: {e}")
+
+    async def _run(self):
+        interval = self.min_interval
+        loop = asyncio.get_running_loop()
+
+        while self.watches:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=interval)
+                interval = self.min_interval
+            except asyncio.TimeoutError:
+                interval = min(interval * 2, self.max_interval)
+            self._wake.clear()
+
+            pending = {i for watch in self.watches for i, state in watch['states'].items() if not self._settled(state, watch['targets'][i])}
+            try:
+                states = await self.ec2_manager.get_instance_states(list(pending)) if pending else {}
+            except Exception as e:
+                print(f"Error polling instance states: {e}")
+                continue
+
+            now = loop.time()
+            for watch in list(self.watches):
+                for instance_id in watch['states']:
+                    if instance_id in states:
+                        watch['states'][instance_id] = states[instance_id]
+
+                if self._is_done(watch):
+                    self.watches.remove(watch)
+                    await self._finish(watch)
+                elif now >= watch['deadline']:
+                    self.watches.remove(watch)
+                    await self._finish(watch, timed_out=True)
@@ -1,4 +1,5 @@
 import os
+import socket
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -7,8 +8,40 @@ TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID')
 AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
 AWS_REGION = os.getenv('AWS_REGION')
+AWS_REGIONS = [region.strip() for region in (os.getenv('AWS_REGIONS') or AWS_REGION or '').split(',') if region.strip()]
 POSTGRES_URL = os.getenv('POSTGRES_URL')
 AUTHORIZED_GROUP_ID = os.getenv('AUTHORIZED_GROUP_ID')
 TZ_TIMEZONE= os.getenv("TZ_TIMEZONE")
-
-
+EC2_MAX_WORKERS = int(os.getenv('EC2_MAX_WORKERS') or 8)
+EC2_BATCH_SIZE = int(os.getenv('EC2_BATCH_SIZE') or 50)
+EC2_PAGE_SIZE = int(os.getenv('EC2_PAGE_SIZE') or 100)
+EC2_CACHE_TTL = float(os.getenv('EC2_CACHE_TTL') or 30)
+POSTGRES_POOL_MIN = int(os.getenv('POSTGRES_POOL_MIN') or 1)
+POSTGRES_POOL_MAX = int(os.getenv('POSTGRES_POOL_MAX') or 10)
+POSTGRES_POOL_HEALTHCHECK = float(os.getenv('POSTGRES_POOL_HEALTHCHECK') or 60)
+SCHEDULE_MISFIRE_POLICY = os.getenv('SCHEDULE_MISFIRE_POLICY') or 'run_once'
+SCHEDULE_MAX_CATCHUP_RUNS = int(os.getenv('SCHEDULE_MAX_CATCHUP_RUNS') or 10)
+SCHEDULE_WINDOW_MINUTES = float(os.getenv('SCHEDULE_WINDOW_MINUTES') or 60)
+SCHEDULE_PAGE_SIZE = int(os.getenv('SCHEDULE_PAGE_SIZE') or 500)
+SCHEDULE_COALESCE_SECONDS = float(os.getenv('SCHEDULE_COALESCE_SECONDS') or 1)
+SCHEDULE_NODE_ID = os.getenv('SCHEDULE_NODE_ID') or f"{socket.gethostname()}-{os.getpid()}"
+SCHEDULE_LEASE_SECONDS = float(os.getenv('SCHEDULE_LEASE_SECONDS') or 300)
+SCHEDULE_MISFIRE_GRACE_SECONDS = float(os.getenv('SCHEDULE_MISFIRE_GRACE_SECONDS') or 60)
+BOT_MODE = (os.getenv('BOT_MODE') or 'polling').lower()
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN') or '0.0.0.0'
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT') or 8443)
+WEBHOOK_PATH = (os.getenv('WEBHOOK_PATH') or 'telegram').strip('/')
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN') or None
+EC2_WAITER_MIN_INTERVAL = float(os.getenv('EC2_WAITER_MIN_INTERVAL') or 2)
+EC2_WAITER_MAX_INTERVAL = float(os.getenv('EC2_WAITER_MAX_INTERVAL') or 30)
+EC2_WAITER_TIMEOUT = float(os.getenv('EC2_WAITER_TIMEOUT') or 600)
+SESSION_BACKEND = (os.getenv('SESSION_BACKEND') or 'memory').lower()
+SESSION_TTL_SECONDS = float(os.getenv('SESSION_TTL_SECONDS') or 1800)
+SESSION_MAX_ENTRIES = int(os.getenv('SESSION_MAX_ENTRIES') or 1000)
+OUTBOUND_RATE_PER_MINUTE = float(os.getenv('OUTBOUND_RATE_PER_MINUTE') or 20)
+OUTBOUND_BURST = float(os.getenv('OUTBOUND_BURST') or 3)
+OUTBOUND_MAX_RETRIES = int(os.getenv('OUTBOUND_MAX_RETRIES') or 5)
+OUTBOUND_FLUSH_TIMEOUT = float(os.getenv('OUTBOUND_FLUSH_TIMEOUT') or 10)
+METRICS_PORT = int(os.getenv('METRICS_PORT') or 9108)
+METRICS_ADDR = os.getenv('METRICS_ADDR') or '127.0.0.1'
@@ -0,0 +1,218 @@
+import asyncio
+from datetime import timezone as dt_timezone
+import asyncpg
+from config import POSTGRES_URL, POSTGRES_POOL_MIN, POSTGRES_POOL_MAX
+from metrics import timed_db, DB_ERRORS
+
+_pool = None
+_pool_lock = asyncio.Lock()
+
+async def get_pool():
+    global _pool
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                _pool = await asyncpg.create_pool(POSTGRES_URL, min_size=POSTGRES_POOL_MIN, max_size=POSTGRES_POOL_MAX)
+    return _pool
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+def _to_db_time(value):
+    # schedule_time is a TIMESTAMP column holding UTC; asyncpg rejects aware datetimes for it
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(dt_timezone.utc).replace(tzinfo=None)
+    return value
+
+@timed_db
+async def add_schedule(group_id, instance_id, action, schedule_time, dias_semana=None, horario=None, repetir=False, timezone=None):
+    pool = await get_pool()
+    return await pool.fetchval(
+        '''INSERT INTO schedules
+           (chat_id, instance_id, action, schedule_time, dias_semana, horario, repetir, timezone)
+           VALUES ($1, $2, $3, $4, $5, $6, $7, $8) RETURNING id''',
+        group_id, instance_id, action, _to_db_time(schedule_time), dias_semana, horario, repetir, timezone
+    )
+
+@timed_db
+async def get_schedules(group_id=None):
+    try:
+        pool = await get_pool()
+        if group_id:
+            rows = await pool.fetch('SELECT * FROM schedules WHERE chat_id = $1 ORDER BY schedule_time', group_id)
+        else:
+            rows = await pool.fetch('SELECT * FROM schedules ORDER BY schedule_time')
+        return [dict(row) for row in rows]
+    except (asyncpg.PostgresError, OSError) as e:
+        DB_ERRORS.labels(function='get_schedules').inc()
+        print(f"Erro ao buscar agendamentos: {e}")
+        return []
+
+@timed_db
+async def get_schedules_page(group_id, limit, offset=0):
+    # One extra row tells whether a next page exists without a COUNT query
+    try:
+        pool = await get_pool()
+        rows = await pool.fetch(
+            'SELECT * FROM schedules WHERE chat_id = $1 ORDER BY schedule_time, id LIMIT $2 OFFSET $3',
+            group_id, limit + 1, offset
+        )
+        return [dict(row) for row in rows[:limit]], len(rows) > limit
+    except (asyncpg.PostgresError, OSError) as e:
+        DB_ERRORS.labels(function='get_schedules_page').inc()
+        print(f"Erro ao buscar agendamentos: {e}")
+        return [], False
+
+@timed_db
+async def get_schedules_between(start, end, after_id=0, limit=500):
+    # Keyset page over (schedule_time, id); errors propagate so callers do not skip a window
+    pool = await get_pool()
+    rows = await pool.fetch(
+        '''SELECT * FROM schedules
+           WHERE (schedule_time, id) > ($1, $2) AND schedule_time <= $3
+           ORDER BY schedule_time, id
+           LIMIT $4''',
+        _to_db_time(start), after_id, _to_db_time(end), limit
+    )
+    return [dict(row) for row in rows]
+
+@timed_db
+async def get_overdue_schedules(before, now):
+    # Only recurring rows can be missed; leased rows are being executed by a replica right now
+    pool = await get_pool()
+    rows = await pool.fetch(
+        '''SELECT * FROM schedules
+           WHERE schedule_time <= $1 AND (locked_until IS NULL OR locked_until < $2)
+             AND dias_semana <> '' AND horario <> ''
+           ORDER BY schedule_time, id''',
+        _to_db_time(before), _to_db_time(now)
+    )
+    return [dict(row) for row in rows]
+
+@timed_db
+async def get_repeating_schedules():
+    try:
+        pool = await get_pool()
+        rows = await pool.fetch('SELECT * FROM schedules WHERE repetir = TRUE ORDER BY schedule_time')
+        return [dict(row) for row in rows]
+    except (asyncpg.PostgresError, OSError) as e:
+        DB_ERRORS.labels(function='get_repeating_schedules').inc()
+        print(f"Erro ao buscar agendamentos repetitivos: {e}")
+        return []
+
+@timed_db
+async def update_next_schedule_time(schedule_id, next_time):
+    try:
+        pool = await get_pool()
+        await pool.execute('UPDATE schedules SET schedule_time = $1 WHERE id = $2', _to_db_time(next_time), schedule_id)
+        return True
+    except (asyncpg.PostgresError, OSError) as e:
+        DB_ERRORS.labels(function='update_next_schedule_time').inc()
+        print(f"Erro ao atualizar horário: {e}")
+        return False
+
+@timed_db
+async def advance_overdue_schedules(updates):
+    # updates: (id, expected schedule_time, next schedule_time); only rows still at the expected time move
+    if not updates:
+        return set()
+    pool = await get_pool()
+    rows = await pool.fetch(
+        '''UPDATE schedules AS s SET schedule_time = v.next_time
+           FROM unnest($1::int[], $2::timestamp[], $3::timestamp[]) AS v(id, expected_time, next_time)
+           WHERE s.id = v.id AND s.schedule_time = v.expected_time
+             AND (s.locked_until IS NULL OR s.locked_until < (now() AT TIME ZONE 'UTC'))
+           RETURNING s.id''',
+        [u[0] for u in updates], [_to_db_time(u[1]) for u in updates], [_to_db_time(u[2]) for u in updates]
+    )
+    return {row['id'] for row in rows}
+
+@timed_db
+async def claim_schedules(claims, node_id, lease_seconds):
+    # claims: (id, planned schedule_time, next schedule_time or None for one-shot rows).
+    # The row moves to its next time in the claiming statement, so an occurrence that was claimed is never seen as missed.
+    # The lease is left to expire, so a late replica cannot claim a one-shot row again.
+    if not claims:
+        return set()
+    pool = await get_pool()
+    rows = await pool.fetch(
+        '''UPDATE schedules AS s
+           SET schedule_time = COALESCE(v.next_time, s.schedule_time),
+               locked_by = $1, locked_until = (now() AT TIME ZONE 'UTC') + make_interval(secs => $2)
+           FROM unnest($3::int[], $4::timestamp[], $5::timestamp[]) AS v(id, schedule_time, next_time)
+           WHERE s.id = v.id AND s.schedule_time = v.schedule_time
+             AND (s.locked_until IS NULL OR s.locked_until < (now() AT TIME ZONE 'UTC'))
+           RETURNING s.id''',
+        node_id, float(lease_seconds), [c[0] for c in claims], [_to_db_time(c[1]) for c in claims], [_to_db_time(c[2]) for c in claims]
+    )
+    return {row['id'] for row in rows}
+
+@timed_db
+async def delete_schedule(schedule_id, group_id):
+    try:
+        pool = await get_pool()
+        deleted = await pool.fetchval('DELETE FROM schedules WHERE id = $1 AND chat_id = $2 RETURNING id', schedule_id, group_id)
+        return deleted is not None
+    except (asyncpg.PostgresError, OSError) as e:
+        DB_ERRORS.labels(function='delete_schedule').inc()
+        print(f"Erro ao deletar agendamento: {e}")
+        return False
+
+@timed_db
+async def delete_all_schedules(group_id):
+    try:
+        pool = await get_pool()
+        rows = await pool.fetch('DELETE FROM schedules WHERE chat_id = $1 RETURNING id', group_id)
+        return [row['id'] for row in rows]
+    except (asyncpg.PostgresError, OSError) as e:
+        DB_ERRORS.labels(function='delete_all_schedules').inc()
+        print(f"Erro ao deletar todos os agendamentos: {e}")
+        return []
+
+@timed_db
+async def get_schedule_by_id(schedule_id):
+    try:
+        pool = await get_pool()
+        row = await pool.fetchrow('SELECT * FROM schedules WHERE id = $1', schedule_id)
+        return dict(row) if row else None
+    except (asyncpg.PostgresError, OSError) as e:
+        DB_ERRORS.labels(function='get_schedule_by_id').inc()
+        print(f"Erro ao buscar agendamento por ID: {e}")
+        return None
+
+@timed_db
+async def get_session(user_id):
+    pool = await get_pool()
+    return await pool.fetchval(
+        "SELECT data FROM wizard_sessions WHERE user_id = $1 AND expires_at > (now() AT TIME ZONE 'UTC')",
+        user_id
+    )
+
+@timed_db
+async def save_session(user_id, data, ttl_seconds):
+    pool = await get_pool()
+    await pool.execute(
+        '''INSERT INTO wizard_sessions (user_id, data, expires_at)
+           VALUES ($1, $2::jsonb, (now() AT TIME ZONE 'UTC') + make_interval(secs => $3))
+           ON CONFLICT (user_id) DO UPDATE SET data = EXCLUDED.data, expires_at = EXCLUDED.expires_at''',
+        user_id, data, float(ttl_seconds)
+    )
+
+@timed_db
+async def delete_session(user_id):
+    pool = await get_pool()
+    await pool.execute('DELETE FROM wizard_sessions WHERE user_id = $1', user_id)
+
+@timed_db
+async def delete_expired_sessions():
+    try:
+        pool = await get_pool()
+        rows = await pool.fetch("DELETE FROM wizard_sessions WHERE expires_at <= (now() AT TIME ZONE 'UTC') RETURNING user_id")
+        return len(rows)
+    except (asyncpg.PostgresError, OSError) as e:
+        DB_ERRORS.labels(function='delete_expired_sessions').inc()
+        print(f"Erro ao remover sessões expiradas: {e}")
+        return 0
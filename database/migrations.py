@@ -0,0 +1,90 @@
+# Ordered schema migrations. Append new entries; never edit or reorder applied ones.
+MIGRATIONS = [
+    (1, [
+        '''
+        CREATE TABLE IF NOT EXISTS schedules (
+            id SERIAL PRIMARY KEY,
+            chat_id BIGINT,
+            instance_id TEXT,
+            action TEXT,
+            schedule_time TIMESTAMP,
+            dias_semana TEXT,
+            horario TEXT,
+            repetir BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    ]),
+    # Tables created by older releases lack the recurrence columns
+    (2, [
+        'ALTER TABLE schedules ADD COLUMN IF NOT EXISTS dias_semana TEXT',
+        'ALTER TABLE schedules ADD COLUMN IF NOT EXISTS horario TEXT',
+        'ALTER TABLE schedules ADD COLUMN IF NOT EXISTS repetir BOOLEAN DEFAULT FALSE',
+    ]),
+    # get_schedules(chat_id) / delete_all_schedules, the startup loader, and get_repeating_schedules
+    (3, [
+        'CREATE INDEX IF NOT EXISTS idx_schedules_chat_id_schedule_time ON schedules (chat_id, schedule_time)',
+        'CREATE INDEX IF NOT EXISTS idx_schedules_schedule_time ON schedules (schedule_time)',
+        'CREATE INDEX IF NOT EXISTS idx_schedules_repeating_schedule_time ON schedules (schedule_time) WHERE repetir = TRUE',
+    ]),
+    # Per-schedule IANA timezone; NULL falls back to TZ_TIMEZONE
+    (4, [
+        'ALTER TABLE schedules ADD COLUMN IF NOT EXISTS timezone TEXT',
+    ]),
+    # Keyset paging of the scheduling window orders by (schedule_time, id)
+    (5, [
+        'CREATE INDEX IF NOT EXISTS idx_schedules_schedule_time_id ON schedules (schedule_time, id)',
+        'DROP INDEX IF EXISTS idx_schedules_schedule_time',
+    ]),
+    # Row leases so several bot replicas never execute the same occurrence twice
+    (6, [
+        'ALTER TABLE schedules ADD COLUMN IF NOT EXISTS locked_by TEXT',
+        'ALTER TABLE schedules ADD COLUMN IF NOT EXISTS locked_until TIMESTAMP',
+    ]),
+    # Schedule wizard state, so a restart does not interrupt users mid-flow
+    (7, [
+        '''
+        CREATE TABLE IF NOT EXISTS wizard_sessions (
+            user_id BIGINT PRIMARY KEY,
+            data JSONB NOT NULL,
+            expires_at TIMESTAMP NOT NULL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_wizard_sessions_expires_at ON wizard_sessions (expires_at)',
+    ]),
+    # Indexes shaped after the queries the bot runs. Nothing sets repetir, so the partial index of migration 3 was empty.
+    # Executed one-shot rows stay in the past forever, so overdue lookups only index recurring rows.
+    (8, [
+        'DROP INDEX IF EXISTS idx_schedules_repeating_schedule_time',
+        "CREATE INDEX IF NOT EXISTS idx_schedules_recurring_schedule_time ON schedules (schedule_time, id) WHERE dias_semana <> '' AND horario <> ''",
+        'CREATE INDEX IF NOT EXISTS idx_schedules_chat_id_schedule_time_id ON schedules (chat_id, schedule_time, id)',
+        'DROP INDEX IF EXISTS idx_schedules_chat_id_schedule_time',
+    ]),
+]
+
+# Serialises migrations when several bot processes start at the same time
+MIGRATION_LOCK_ID = 7358120
+
+def apply_migrations(conn):
+    with conn.cursor() as cur:
+        cur.execute('SELECT pg_advisory_xact_lock(%s)', (MIGRATION_LOCK_ID,))
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cur.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version')
+        current = cur.fetchone()[0]
+
+        applied = []
+        for version, statements in MIGRATIONS:
+            if version <= current:
+                continue
+            for statement in statements:
+                cur.execute(statement)
+            cur.execute('INSERT INTO schema_version (version) VALUES (%s)', (version,))
+            applied.append(version)
+
+    conn.commit()
+    return applied
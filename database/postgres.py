@@ -1,256 +1,208 @@
+import threading
+import time
+from contextlib import contextmanager
 import psycopg2
 from psycopg2.extras import RealDictCursor
-from config import POSTGRES_URL
+from psycopg2.pool import ThreadedConnectionPool
+from database.migrations import apply_migrations
+from config import POSTGRES_URL, POSTGRES_POOL_MIN, POSTGRES_POOL_MAX, POSTGRES_POOL_HEALTHCHECK
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_slots = threading.BoundedSemaphore(POSTGRES_POOL_MAX)
+_last_used = {}
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadedConnectionPool(POSTGRES_POOL_MIN, POSTGRES_POOL_MAX, POSTGRES_URL)
+    return _pool
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+            _last_used.clear()
+
+def _is_healthy(conn):
+    if conn.closed:
+        return False
+
+    # Only ping connections that sat idle long enough for the server or a proxy to drop them
+    if time.monotonic() - _last_used.get(id(conn), 0) < POSTGRES_POOL_HEALTHCHECK:
+        return True
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+def _checkout(pool):
+    conn = pool.getconn()
+    if not _is_healthy(conn):
+        _last_used.pop(id(conn), None)
+        pool.putconn(conn, close=True)
+        conn = pool.getconn()
+    return conn
+
+def _checkin(pool, conn, broken):
+    if not broken and not conn.closed:
+        try:
+            # Ends any transaction left open by read-only callers
+            conn.rollback()
+            conn.autocommit = False
+        except psycopg2.Error:
+            broken = True
+
+    if broken or conn.closed:
+        _last_used.pop(id(conn), None)
+        pool.putconn(conn, close=True)
+    else:
+        _last_used[id(conn)] = time.monotonic()
+        pool.putconn(conn)
+
+@contextmanager
+def get_connection(autocommit=False):
+    pool = get_pool()
+    # ThreadedConnectionPool raises when exhausted, so wait for a free slot instead
+    with _pool_slots:
+        conn = _checkout(pool)
+        broken = False
+        try:
+            conn.autocommit = autocommit
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            _checkin(pool, conn, broken)
 
 def init_db():
-    conn = psycopg2.connect(POSTGRES_URL)
-    conn.autocommit = True  
-    cur = conn.cursor()
-    
     try:
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS schedules (
-                id SERIAL PRIMARY KEY,
-                chat_id BIGINT,
-                instance_id TEXT,
-                action TEXT,
-                schedule_time TIMESTAMP,
-                dias_semana TEXT,           
-                horario TEXT,              
-                repetir BOOLEAN DEFAULT FALSE,  
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        with get_connection() as conn:
+            applied = apply_migrations(conn)
+        if applied:
+            print(f"Migrações aplicadas: {', '.join(map(str, applied))}")
         print("Tabela 'schedules' verificada/criada.")
-        
+
     except Exception as e:
         print(f"Erro ao criar tabela: {e}")
-        conn.rollback()
-    finally:
-        cur.close()
-        conn.close()
+        raise
 
-def check_and_fix_columns():
-    conn = psycopg2.connect(POSTGRES_URL)
-    conn.autocommit = True 
-    cur = conn.cursor()
-    
-    try:
-        cur.execute("SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_name = 'schedules')")
-        table_exists = cur.fetchone()[0]
-        
-        if not table_exists:
-            init_db()
-            return
-        
-        
-        columns_to_check = [
-            ('dias_semana', 'TEXT'),
-            ('horario', 'TEXT'),
-            ('repetir', 'BOOLEAN DEFAULT FALSE')
-        ]
-        
-        for column_name, column_type in columns_to_check:
-            cur.execute("""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name='schedules' AND column_name=%s
-            """, (column_name,))
-            
-            if not cur.fetchone():
-                
-                try:
-                    cur.execute(f"ALTER TABLE schedules ADD COLUMN {column_name} {column_type}")
-                except Exception as e:
-                    conn.rollback()
-            else:
-                break
-        
-        
-    except Exception as e:
-        print(f"Erro ao verificar/consertar colunas: {e}")
-        conn.rollback()
-    finally:
-        cur.close()
-        conn.close()
+def add_schedule(group_id, instance_id, action, schedule_time, dias_semana=None, horario=None, repetir=False, timezone=None):
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                '''INSERT INTO schedules
+                   (chat_id, instance_id, action, schedule_time, dias_semana, horario, repetir, timezone)
+                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s) RETURNING id''',
+                (group_id, instance_id, action, schedule_time, dias_semana, horario, repetir, timezone)
+            )
 
-def add_schedule(group_id, instance_id, action, schedule_time, dias_semana=None, horario=None, repetir=False):
-    conn = psycopg2.connect(POSTGRES_URL)
-    cur = conn.cursor()
-    
-    try:
-        check_and_fix_columns()
-        
-        cur.execute(
-            '''INSERT INTO schedules 
-               (chat_id, instance_id, action, schedule_time, dias_semana, horario, repetir) 
-               VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id''',
-            (group_id, instance_id, action, schedule_time, dias_semana, horario, repetir)
-        )
-        
-        schedule_id = cur.fetchone()[0]
+            schedule_id = cur.fetchone()[0]
         conn.commit()
         return schedule_id
-        
-    except psycopg2.Error as e:
-        conn.rollback()
-        
-        if "column" in str(e) and "does not exist" in str(e):
-            cur.close()
-            conn.close()
-            
-            force_recreate_table()
-            
-            return add_schedule(group_id, instance_id, action, schedule_time, dias_semana, horario, repetir)
-        raise
-        
-    except Exception as e:
-        conn.rollback()
-        raise
-        
-    finally:
-        if 'cur' in locals():
-            cur.close()
-        if 'conn' in locals():
-            conn.close()
-
-def force_recreate_table():
 
-    conn = psycopg2.connect(POSTGRES_URL)
-    conn.autocommit = True
-    cur = conn.cursor()
-    
+def force_recreate_table(force=False):
     try:
-        cur.execute("SELECT COUNT(*) FROM schedules")
-        count = cur.fetchone()[0]
-        
-        if count > 0:
-            resposta = input("Continuar? (s/n): ")
-            if resposta.lower() != 's':
-                print("Operação cancelada.")
-                return
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT COUNT(*) FROM schedules")
+                count = cur.fetchone()[0]
 
-        cur.execute('DROP TABLE IF EXISTS schedules CASCADE')
-        print("Tabela antiga removida.")
-        
-        cur.execute('''
-            CREATE TABLE schedules (
-                id SERIAL PRIMARY KEY,
-                chat_id BIGINT,
-                instance_id TEXT,
-                action TEXT,
-                schedule_time TIMESTAMP,
-                dias_semana TEXT,           
-                horario TEXT,              
-                repetir BOOLEAN DEFAULT FALSE,  
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+                if count > 0 and not force:
+                    print(f"Operação cancelada: a tabela possui {count} agendamentos. Use force=True para recriar.")
+                    return False
+
+                cur.execute('DROP TABLE IF EXISTS schedules CASCADE')
+                cur.execute('DELETE FROM schema_version')
+                print("Tabela antiga removida.")
+
+            apply_migrations(conn)
+            return True
 
     except Exception as e:
         print(f"Erro ao recriar tabela: {e}")
-        conn.rollback()
-    finally:
-        cur.close()
-        conn.close()
+        return False
 
 def get_schedules(group_id=None):
-    conn = psycopg2.connect(POSTGRES_URL)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    
     try:
-        if group_id:
-            cur.execute('SELECT * FROM schedules WHERE chat_id = %s ORDER BY schedule_time', (group_id,))
-        else:
-            cur.execute('SELECT * FROM schedules ORDER BY schedule_time')
-        
-        schedules = cur.fetchall()
-        return schedules
+        with get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                if group_id:
+                    cur.execute('SELECT * FROM schedules WHERE chat_id = %s ORDER BY schedule_time', (group_id,))
+                else:
+                    cur.execute('SELECT * FROM schedules ORDER BY schedule_time')
+
+                schedules = cur.fetchall()
+                return schedules
     except psycopg2.Error as e:
         print(f"Erro ao buscar agendamentos: {e}")
         return []
-    finally:
-        cur.close()
-        conn.close()
 
 def get_repeating_schedules():
-    conn = psycopg2.connect(POSTGRES_URL)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    
     try:
-        cur.execute('SELECT * FROM schedules WHERE repetir = TRUE ORDER BY schedule_time')
-        schedules = cur.fetchall()
-        return schedules
+        with get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute('SELECT * FROM schedules WHERE repetir = TRUE ORDER BY schedule_time')
+                schedules = cur.fetchall()
+                return schedules
     except psycopg2.Error as e:
         print(f"Erro ao buscar agendamentos repetitivos: {e}")
         return []
-    finally:
-        cur.close()
-        conn.close()
 
 def update_next_schedule_time(schedule_id, next_time):
-    conn = psycopg2.connect(POSTGRES_URL)
-    cur = conn.cursor()
-    
     try:
-        cur.execute(
-            'UPDATE schedules SET schedule_time = %s WHERE id = %s',
-            (next_time, schedule_id)
-        )
-        conn.commit()
-        return True
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    'UPDATE schedules SET schedule_time = %s WHERE id = %s',
+                    (next_time, schedule_id)
+                )
+            conn.commit()
+            return True
     except psycopg2.Error as e:
         print(f"Erro ao atualizar horário: {e}")
-        conn.rollback()
         return False
-    finally:
-        cur.close()
-        conn.close()
 
 def delete_schedule(schedule_id, group_id):
-    conn = psycopg2.connect(POSTGRES_URL)
-    cur = conn.cursor()
     try:
-        cur.execute('DELETE FROM schedules WHERE id = %s AND chat_id = %s', (schedule_id, group_id))
-        rows_deleted = cur.rowcount
-        conn.commit()
-        return rows_deleted > 0
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute('DELETE FROM schedules WHERE id = %s AND chat_id = %s', (schedule_id, group_id))
+                rows_deleted = cur.rowcount
+            conn.commit()
+            return rows_deleted > 0
     except psycopg2.Error as e:
         print(f"Erro ao deletar agendamento: {e}")
-        conn.rollback()
         return False
-    finally:
-        cur.close()
-        conn.close()
 
 def delete_all_schedules(group_id):
-    conn = psycopg2.connect(POSTGRES_URL)
-    cur = conn.cursor()
     try:
-        cur.execute('DELETE FROM schedules WHERE chat_id = %s', (group_id,))
-        rows_deleted = cur.rowcount
-        conn.commit()
-        return rows_deleted
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute('DELETE FROM schedules WHERE chat_id = %s', (group_id,))
+                rows_deleted = cur.rowcount
+            conn.commit()
+            return rows_deleted
     except psycopg2.Error as e:
         print(f"Erro ao deletar todos os agendamentos: {e}")
-        conn.rollback()
         return 0
-    finally:
-        cur.close()
-        conn.close()
 
 def get_schedule_by_id(schedule_id):
-    conn = psycopg2.connect(POSTGRES_URL)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    
     try:
-        cur.execute('SELECT * FROM schedules WHERE id = %s', (schedule_id,))
-        schedule = cur.fetchone()
-        return schedule
+        with get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute('SELECT * FROM schedules WHERE id = %s', (schedule_id,))
+                schedule = cur.fetchone()
+                return schedule
     except psycopg2.Error as e:
         print(f"Erro ao buscar agendamento por ID: {e}")
         return None
-    finally:
-        cur.close()
-        conn.close()
-
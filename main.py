@@ -1,16 +1,46 @@
 # main.py
 from telegram.ext import Application
-from config import TELEGRAM_BOT_TOKEN
-from bot.bot_handler import setup_handlers
+from config import TELEGRAM_BOT_TOKEN, BOT_MODE, WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET_TOKEN
+from bot.bot_handler import setup_handlers, on_stop, on_shutdown
+from database.postgres import init_db
+from metrics import start_metrics_server
 from telegram import Update
+
+# The bot only reacts to messages and button presses
+ALLOWED_UPDATES = [Update.MESSAGE, Update.CALLBACK_QUERY]
+
+def webhook_options(url=WEBHOOK_URL, secret_token=WEBHOOK_SECRET_TOKEN, listen=WEBHOOK_LISTEN, port=WEBHOOK_PORT, path=WEBHOOK_PATH):
+    if not url:
+        raise ValueError("WEBHOOK_URL is required when BOT_MODE=webhook")
+    # Without the secret anyone who finds the endpoint can post forged updates
+    if not secret_token:
+        raise ValueError("WEBHOOK_SECRET_TOKEN is required when BOT_MODE=webhook")
+    return {
+        'listen': listen,
+        'port': port,
+        'url_path': path,
+        'webhook_url': f"{url.rstrip('/')}/{path}",
+        'secret_token': secret_token,
+        'allowed_updates': ALLOWED_UPDATES,
+    }
+
 def main():
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    # Checked before anything starts, so a misconfigured webhook fails fast
+    options = webhook_options() if BOT_MODE == 'webhook' else None
+    init_db()
+    start_metrics_server()
+    
+    application = Application.builder().token(TELEGRAM_BOT_TOKEN).post_stop(on_stop).post_shutdown(on_shutdown).build()
     
     setup_handlers(application)
     print("=" * 40)
-    print("Bot Initialized")
+    print(f"Bot Initialized ({BOT_MODE})")
     print("=" * 40)
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    
+    if options:
+        application.run_webhook(**options)
+    else:
+        application.run_polling(allowed_updates=ALLOWED_UPDATES)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,71 @@
+import time
+from functools import wraps
+from prometheus_client import Counter, Histogram, start_http_server
+from config import METRICS_PORT, METRICS_ADDR
+
+# Schedule lag spans sub-second wake-ups to runs delayed by a restart
+LAG_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 300, 900, 3600)
+
+EC2_CALL_SECONDS = Histogram('ec2_api_call_seconds', 'Latency of EC2 API calls', ['operation', 'region'])
+EC2_ERRORS = Counter('ec2_api_errors_total', 'EC2 API calls that failed', ['operation', 'code'])
+DB_QUERY_SECONDS = Histogram('db_query_seconds', 'Latency of database functions', ['function'])
+DB_ERRORS = Counter('db_errors_total', 'Database functions that failed', ['function'])
+CALLBACK_SECONDS = Histogram('bot_callback_seconds', 'Time spent handling a button press', ['route'])
+CALLBACK_ERRORS = Counter('bot_callback_errors_total', 'Button presses whose handler raised', ['route'])
+SCHEDULE_LAG_SECONDS = Histogram('schedule_fire_lag_seconds', 'Actual minus planned execution time of schedules', buckets=LAG_BUCKETS)
+SCHEDULE_ERRORS = Counter('schedule_errors_total', 'Failures while executing or rescheduling schedules', ['stage'])
+NOTIFICATIONS_DROPPED = Counter('bot_notifications_dropped_total', 'Notifications given up on by the outbound queue', ['reason'])
+
+def start_metrics_server(port=METRICS_PORT, addr=METRICS_ADDR):
+    if not port:
+        return False
+    start_http_server(port, addr=addr)
+    print(f"Metrics served on http://{addr}:{port}/metrics")
+    return True
+
+def timed_db(func):
+    # Latency per database function; errors the function handles itself are counted with DB_ERRORS directly
+    histogram = DB_QUERY_SECONDS.labels(function=func.__name__)
+    errors = DB_ERRORS.labels(function=func.__name__)
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - started)
+    return wrapper
+
+def instrument_boto_client(client):
+    # botocore emits these around every API call, including each page of a paginator
+    region = client.meta.region_name or 'default'
+
+    def before_call(model, context, **kwargs):
+        context['metrics_started'] = time.perf_counter()
+        context['metrics_operation'] = model.name
+
+    def observe(context):
+        started = context.pop('metrics_started', None)
+        if started is not None:
+            EC2_CALL_SECONDS.labels(operation=context['metrics_operation'], region=region).observe(time.perf_counter() - started)
+
+    def after_call(parsed, context, **kwargs):
+        observe(context)
+        error = parsed.get('Error') if isinstance(parsed, dict) else None
+        if error:
+            # before_call is skipped when another handler answers the request (e.g. botocore's Stubber)
+            EC2_ERRORS.labels(operation=context.get('metrics_operation', 'Unknown'), code=error.get('Code', 'Unknown')).inc()
+
+    def after_call_error(exception, context, **kwargs):
+        observe(context)
+        EC2_ERRORS.labels(operation=context.get('metrics_operation', 'Unknown'), code=type(exception).__name__).inc()
+
+    events = client.meta.events
+    events.register('before-call.ec2', before_call)
+    events.register('after-call.ec2', after_call)
+    events.register('after-call-error.ec2', after_call_error)
+    return client
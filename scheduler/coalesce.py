@@ -0,0 +1,29 @@
+ACTION_STATES = {'start': 'stopped', 'stop': 'running'}
+
+def coalesce(schedules):
+    # Groups schedules by action, dropping repeated instance/action pairs
+    groups = {}
+    for schedule in schedules:
+        group = groups.setdefault(schedule['action'], {'all': False, 'instances': {}})
+        if schedule['instance_id'] == 'all':
+            group['all'] = True
+        else:
+            group['instances'][schedule['instance_id']] = True
+    return {action: {'all': group['all'], 'instances': list(group['instances'])} for action, group in groups.items()}
+
+def resolve_targets(groups, inventory):
+    # 'all' expands to the managed instances that are in the state the action changes
+    targets = {}
+    for action, group in groups.items():
+        ids = dict.fromkeys(group['instances'])
+        if group['all']:
+            ids.update(dict.fromkeys(i['id'] for i in inventory if i['state'] == ACTION_STATES.get(action)))
+        targets[action] = ids
+
+    start, stop = targets.get('start', {}), targets.get('stop', {})
+    conflicts = [instance_id for instance_id in start if instance_id in stop]
+    for instance_id in conflicts:
+        del start[instance_id]
+        del stop[instance_id]
+
+    return list(start), list(stop), conflicts
@@ -0,0 +1,55 @@
+from datetime import datetime
+from config import SCHEDULE_MISFIRE_POLICY, SCHEDULE_MAX_CATCHUP_RUNS
+from scheduler.rules import parse_days, next_occurrence
+from scheduler.timeutils import as_utc, now_utc, schedule_timezone
+
+MISFIRE_RUN_ONCE = 'run_once'
+MISFIRE_SKIP = 'skip'
+MISFIRE_RUN_ALL = 'run_all'
+MISFIRE_POLICIES = (MISFIRE_RUN_ONCE, MISFIRE_SKIP, MISFIRE_RUN_ALL)
+
+def is_recurring(schedule):
+    return bool(parse_days(schedule.get('dias_semana')) and schedule.get('horario'))
+
+def next_run_after(schedule, after):
+    return next_occurrence(parse_days(schedule['dias_semana']), schedule['horario'], after, schedule_timezone(schedule))
+
+def missed_runs(schedule, now, limit):
+    # Occurrences in (planned, now], counting the planned one itself, capped at limit
+    runs = []
+    run_time = as_utc(schedule['schedule_time'])
+    while run_time is not None and run_time <= now and len(runs) < limit:
+        runs.append(run_time)
+        run_time = next_run_after(schedule, run_time)
+    return runs
+
+def plan_catch_up(schedules, now=None, policy=SCHEDULE_MISFIRE_POLICY, max_runs=SCHEDULE_MAX_CATCHUP_RUNS):
+    if policy not in MISFIRE_POLICIES:
+        raise ValueError(f"Unknown misfire policy: {policy}")
+
+    now = now or now_utc()
+    plan = []
+
+    for schedule in schedules:
+        schedule_time = schedule.get('schedule_time')
+        if not isinstance(schedule_time, datetime) or as_utc(schedule_time) > now:
+            continue
+
+        # One-shot rows are never advanced after running, so an old one cannot be told apart from a missed one
+        if not is_recurring(schedule):
+            continue
+
+        if policy == MISFIRE_RUN_ALL:
+            runs = missed_runs(schedule, now, max_runs)
+        elif policy == MISFIRE_RUN_ONCE:
+            runs = [as_utc(schedule_time)]
+        else:
+            runs = []
+
+        plan.append({
+            'schedule': schedule,
+            'runs': runs,
+            'next_time': as_utc(next_run_after(schedule, now))
+        })
+
+    return plan
@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta, timezone, time as dt_time
+import pytz
+
+# Weekdays are stored as a 7-bit mask: bit 0 is Monday, bit 6 is Sunday
+ALL_DAYS = 0b1111111
+BUSINESS_DAYS = 0b0011111
+WEEKEND = 0b1100000
+
+def days_to_mask(days):
+    mask = 0
+    for day in days:
+        mask |= 1 << int(day)
+    return mask & ALL_DAYS
+
+def mask_to_days(mask):
+    return [day for day in range(7) if mask >> day & 1]
+
+def parse_days(dias_semana):
+    if not dias_semana:
+        return 0
+    return days_to_mask(d for d in dias_semana.split(',') if d.strip())
+
+def format_days(mask):
+    return ','.join(map(str, mask_to_days(mask)))
+
+def parse_horario(horario):
+    if isinstance(horario, dt_time):
+        return horario
+    hora, minuto = map(int, horario.split(':'))
+    return dt_time(hora, minuto)
+
+def localize(day, horario, tz):
+    naive = datetime.combine(day, horario)
+    if hasattr(tz, 'localize'):
+        try:
+            return tz.localize(naive, is_dst=None)
+        except pytz.AmbiguousTimeError:
+            # The repeated hour runs once, at its first occurrence
+            return tz.localize(naive, is_dst=True)
+        except pytz.NonExistentTimeError:
+            # A skipped time is moved forward by the size of the gap, e.g. 02:30 -> 03:30
+            return tz.normalize(tz.localize(naive, is_dst=False))
+    # fold=0 gives the same choices for zoneinfo; the round trip turns a skipped 02:30 into 03:30
+    return naive.replace(tzinfo=tz, fold=0).astimezone(timezone.utc).astimezone(tz)
+
+def next_occurrence(mask, horario, after, tz):
+    mask &= ALL_DAYS
+    if not mask:
+        return None
+
+    horario = parse_horario(horario)
+    today = after.astimezone(tz).date()
+    weekday = today.weekday()
+
+    # Rotate so bit 0 is today, then the lowest set bit is the next matching day
+    rotated = ((mask >> weekday) | (mask << (7 - weekday))) & ALL_DAYS
+    if rotated & 1 and localize(today, horario, tz) <= after:
+        rotated &= ~1
+
+    offset = (rotated & -rotated).bit_length() - 1 if rotated else 7
+    return localize(today + timedelta(days=offset), horario, tz)
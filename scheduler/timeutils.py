@@ -0,0 +1,51 @@
+from datetime import datetime, time as dt_time
+from functools import lru_cache
+import re
+import pytz
+from config import TZ_TIMEZONE
+
+DEFAULT_TIMEZONE_NAME = 'America/Sao_Paulo'
+UTC = pytz.UTC
+TIME_INPUT = re.compile(r'^(0[0-9]|1[0-9]|2[0-3]):([0-5][0-9])(?:\s+(\S+))?$')
+
+@lru_cache(maxsize=None)
+def get_timezone(name=None):
+    return pytz.timezone(name or TZ_TIMEZONE or DEFAULT_TIMEZONE_NAME)
+
+# Resolved once at import so a bad TZ_TIMEZONE fails at startup, not on the first schedule
+DEFAULT_TZ = get_timezone()
+
+def is_valid_timezone(name):
+    try:
+        get_timezone(name)
+        return True
+    except pytz.UnknownTimeZoneError:
+        return False
+
+def schedule_timezone(schedule):
+    name = schedule.get('timezone') if schedule else None
+    if name and is_valid_timezone(name):
+        return get_timezone(name)
+    return DEFAULT_TZ
+
+def parse_time_input(text):
+    # "HH:MM" or "HH:MM Area/City"; raises ValueError on a bad format and UnknownTimeZoneError on a bad zone
+    match = TIME_INPUT.match(text.strip())
+    if not match:
+        raise ValueError(f"Invalid time: {text}")
+    return dt_time(int(match.group(1)), int(match.group(2))), get_timezone(match.group(3))
+
+def now_utc():
+    return datetime.now(UTC)
+
+def as_utc(value):
+    # TIMESTAMP columns hold naive UTC values
+    if value.tzinfo is None:
+        return UTC.localize(value)
+    return value.astimezone(UTC)
+
+def to_local(value, tz=None):
+    return as_utc(value).astimezone(tz or DEFAULT_TZ)
+
+def format_local(value, fmt, tz=None):
+    return to_local(value, tz).strftime(fmt)
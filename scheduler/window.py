@@ -0,0 +1,65 @@
+from datetime import timedelta
+from config import SCHEDULE_WINDOW_MINUTES, SCHEDULE_PAGE_SIZE
+from database import async_postgres as db
+from scheduler.timeutils import as_utc, now_utc
+
+class ScheduleWindow:
+    # Keeps only the schedules due in the next SCHEDULE_WINDOW_MINUTES inside the JobQueue
+
+    def __init__(self, callback, window_minutes=SCHEDULE_WINDOW_MINUTES, page_size=SCHEDULE_PAGE_SIZE):
+        self.callback = callback
+        self.window = timedelta(minutes=window_minutes)
+        self.page_size = page_size
+        self.loaded_until = None
+
+    @property
+    def refill_interval(self):
+        return self.window.total_seconds() / 2
+
+    def queue(self, job_queue, schedule, now=None):
+        now = now or now_utc()
+        schedule_time = as_utc(schedule['schedule_time'])
+
+        # Rows past loaded_until are picked up by the next refill
+        if schedule_time <= now or self.loaded_until is None or schedule_time > self.loaded_until:
+            return False
+
+        # Only the pending next run is replaced; catch-up replays share the name so deleting a schedule cancels them too
+        for job in job_queue.get_jobs_by_name(str(schedule['id'])):
+            if not (job.data or {}).get('catch_up'):
+                job.schedule_removal()
+
+        job_queue.run_once(
+            self.callback,
+            when=(schedule_time - now).total_seconds(),
+            name=str(schedule['id']),
+            data=schedule
+        )
+        return True
+
+    async def refill(self, job_queue, now=None):
+        now = now or now_utc()
+        start = self.loaded_until or now
+        end = now + self.window
+        if end <= start:
+            return 0
+
+        queued = 0
+        after_time, after_id = start, 0
+        while True:
+            page = await db.get_schedules_between(after_time, end, after_id, self.page_size)
+            for schedule in page:
+                # Rows between loaded_until and now were never queued (late refill), so run them right away
+                job_queue.run_once(
+                    self.callback,
+                    when=max(0, (as_utc(schedule['schedule_time']) - now).total_seconds()),
+                    name=str(schedule['id']),
+                    data=schedule
+                )
+                queued += 1
+            if len(page) < self.page_size:
+                break
+            after_time, after_id = page[-1]['schedule_time'], page[-1]['id']
+
+        self.loaded_until = end
+        return queued
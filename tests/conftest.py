@@ -0,0 +1,32 @@
+import os
+import pytest
+
+# Modules read their configuration at import time, so placeholders must be set before any of them is imported
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', '123456:TEST')
+os.environ.setdefault('AUTHORIZED_GROUP_ID', '-1001')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'test')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'test')
+os.environ.setdefault('AWS_REGIONS', 'us-east-1')
+os.environ.setdefault('TZ_TIMEZONE', 'America/Sao_Paulo')
+# Database tests run only when a disposable Postgres is provided
+if os.getenv('TEST_POSTGRES_URL'):
+    os.environ['POSTGRES_URL'] = os.environ['TEST_POSTGRES_URL']
+
+@pytest.fixture
+def postgres_url():
+    url = os.getenv('TEST_POSTGRES_URL')
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    return url
+
+@pytest.fixture
+def sync_db(postgres_url):
+    from database import postgres
+
+    postgres.init_db()
+    with postgres.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute('TRUNCATE schedules RESTART IDENTITY')
+        conn.commit()
+    yield postgres
+    postgres.close_pool()
@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from aws.async_ec2_manager import AsyncEC2Manager
+
+INSTANCES = [{'id': 'i-1', 'state': 'running', 'name': 'web', 'region': 'us-east-1'}]
+
+class SlowManager:
+    # Stands in for EC2Manager; every call blocks like a slow describe would
+
+    def __init__(self, delay=0.5, cached=None):
+        self.delay = delay
+        self.cached = cached
+        self.region_executor = ThreadPoolExecutor(max_workers=1)
+        self.threads = []
+
+    def cached_instances(self):
+        return self.cached
+
+    def get_all_instances(self, use_cache=True):
+        self.threads.append(threading.current_thread())
+        time.sleep(self.delay)
+        return list(INSTANCES)
+
+    def start_instance(self, instance_id):
+        self.threads.append(threading.current_thread())
+        time.sleep(self.delay)
+        return True, f"Instance {instance_id} started."
+
+async def count_ticks(stop, interval=0.01):
+    ticks = 0
+    while not stop.is_set():
+        await asyncio.sleep(interval)
+        ticks += 1
+    return ticks
+
+async def run_with_ticker(call):
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(count_ticks(stop))
+    result = await call
+    stop.set()
+    return result, await ticker
+
+def test_slow_ec2_call_does_not_block_the_loop():
+    manager = SlowManager(delay=0.5)
+    facade = AsyncEC2Manager(manager)
+
+    async def scenario():
+        return await run_with_ticker(facade.start_instance('i-1'))
+
+    try:
+        (success, _), ticks = asyncio.run(scenario())
+    finally:
+        facade.shutdown()
+
+    assert success
+    # A blocked loop would let the ticker run at most once or twice
+    assert ticks >= 20
+    assert manager.threads[0] is not threading.main_thread()
+
+def test_concurrent_calls_run_in_parallel():
+    manager = SlowManager(delay=0.3)
+    facade = AsyncEC2Manager(manager, max_workers=4)
+
+    async def scenario():
+        started = time.perf_counter()
+        await asyncio.gather(*(facade.start_instance(f"i-{n}") for n in range(4)))
+        return time.perf_counter() - started
+
+    try:
+        elapsed = asyncio.run(scenario())
+    finally:
+        facade.shutdown()
+
+    assert elapsed < 0.3 * 4 * 0.75
+
+def test_cache_miss_is_fetched_off_the_loop():
+    manager = SlowManager(delay=0.3, cached=None)
+    facade = AsyncEC2Manager(manager)
+
+    async def scenario():
+        return await run_with_ticker(facade.get_all_instances())
+
+    try:
+        instances, ticks = asyncio.run(scenario())
+    finally:
+        facade.shutdown()
+
+    assert instances == INSTANCES
+    assert ticks >= 10
+    assert manager.threads[0] is not threading.main_thread()
+
+def test_cache_hit_is_answered_without_calling_the_manager():
+    manager = SlowManager(cached=list(INSTANCES))
+    facade = AsyncEC2Manager(manager)
+
+    try:
+        instances = asyncio.run(facade.get_all_instances())
+    finally:
+        facade.shutdown()
+
+    assert instances == INSTANCES
+    assert manager.threads == []
+
+def test_cached_instances_never_refreshes():
+    from aws.ec2_manager import EC2Manager
+
+    manager = EC2Manager(regions=['us-east-1'])
+    calls = []
+    manager.iter_instances = lambda region=None: calls.append(region) or iter(INSTANCES)
+    try:
+        assert manager.cached_instances() is None
+        manager.get_all_instances()
+        assert manager.cached_instances() == INSTANCES
+
+        manager.invalidate_cache()
+        assert manager.cached_instances() is None
+        assert len(calls) == 1
+    finally:
+        manager.region_executor.shutdown(wait=False)
@@ -0,0 +1,127 @@
+import asyncio
+import time
+from types import SimpleNamespace
+import pytest
+from bot.callbacks import CALLBACK_VERSION, MAX_CALLBACK_BYTES, ROUTES, CallbackRouter, action, day_preset, instance_action, page, weekday
+
+# A valid value for every argument type used in ROUTES
+SAMPLES = {
+    page: 3,
+    str: 'i-0123456789abcdef0',
+    int: 42,
+    action: 'stop',
+    instance_action: 'details',
+    weekday: 6,
+    day_preset: 'weekend',
+}
+
+def sample_args(name):
+    return [SAMPLES[convert] for convert in ROUTES[name][1]]
+
+@pytest.fixture
+def router():
+    # Every route answers with its own name and the arguments it received
+    router = CallbackRouter()
+    for name in ROUTES:
+        async def handler(update, context, *args, name=name):
+            return name, list(args)
+        router.on(name)(handler)
+    return router
+
+def press(router, data):
+    update = SimpleNamespace(callback_query=SimpleNamespace(data=data))
+    return asyncio.run(router.dispatch(update, None))
+
+def decoded(router, data):
+    result = router.decode(data)
+    if result is None:
+        return None
+    handler, args = result
+    return asyncio.run(handler(None, None, *args))
+
+@pytest.mark.parametrize('name', sorted(ROUTES))
+def test_every_route_round_trips(router, name):
+    args = sample_args(name)
+    data = router.encode(name, *args)
+
+    assert data.startswith(f"{CALLBACK_VERSION}:{ROUTES[name][0]}")
+    assert len(data.encode()) <= MAX_CALLBACK_BYTES
+    assert decoded(router, data) == (name, args)
+
+@pytest.mark.parametrize('name', [name for name, (_, types) in ROUTES.items() if page in types])
+def test_page_defaults_to_the_first_one(router, name):
+    assert decoded(router, router.encode(name)) == (name, [])
+
+@pytest.mark.parametrize('data', [
+    None,
+    '',
+    CALLBACK_VERSION,
+    f"{CALLBACK_VERSION}:",
+    f"{CALLBACK_VERSION}:zz",
+    f"{CALLBACK_VERSION}:m:extra",
+    f"{CALLBACK_VERSION}:i:i-1",
+    f"{CALLBACK_VERSION}:i:i-1:reboot",
+    f"{CALLBACK_VERSION}:sn:all:details",
+    f"{CALLBACK_VERSION}:ds",
+    f"{CALLBACK_VERSION}:ds:abc",
+    f"{CALLBACK_VERSION}:ds:1:2",
+    f"{CALLBACK_VERSION}:td:7",
+    f"{CALLBACK_VERSION}:td:-1",
+    f"{CALLBACK_VERSION}:dp:monday",
+    f"{CALLBACK_VERSION}:im:one",
+    # Plain strings from before the router existed
+    'manage_instances',
+    'instance_i-1_start',
+    'delete_schedule_5',
+])
+def test_malformed_data_is_rejected(router, data):
+    assert router.decode(data) is None
+
+@pytest.mark.parametrize('data', ['0:m', '2:m', f"{int(CALLBACK_VERSION) + 1}:im:1", f"v{CALLBACK_VERSION}:ok"])
+def test_stale_versions_are_rejected(router, data):
+    assert router.decode(data) is None
+
+@pytest.mark.parametrize('data', [f"{CALLBACK_VERSION}:im:-1", f"{CALLBACK_VERSION}:sm:-2", f"{CALLBACK_VERSION}:vs:-10"])
+def test_negative_pages_are_rejected(router, data):
+    assert router.decode(data) is None
+
+def test_dispatch_reports_unknown_buttons(router):
+    assert press(router, router.encode('toggle_day', 2)) is True
+    assert press(router, '0:td:2') is False
+
+def test_route_without_handler_is_not_dispatched():
+    assert CallbackRouter().decode(f"{CALLBACK_VERSION}:m") is None
+
+def test_encode_refuses_data_telegram_would_reject(router):
+    with pytest.raises(ValueError):
+        router.encode('instance', 'i-' + '0' * MAX_CALLBACK_BYTES, 'details')
+
+def test_duplicate_codes_are_refused():
+    with pytest.raises(ValueError):
+        CallbackRouter({'a': ('x', ()), 'b': ('x', ())})
+
+def test_every_route_has_a_handler_in_the_bot():
+    from bot.bot_handler import router as bot_router
+
+    missing = [name for name, code in bot_router.codes.items() if bot_router.routes[code][0] is None]
+    assert missing == []
+
+def test_decode_cost_does_not_grow_with_the_route_table(router):
+    # The old if/elif chain compared every prefix in turn; a route lookup should cost the same for any route
+    first, last = list(ROUTES)[0], list(ROUTES)[-1]
+    presses = 20000
+
+    def per_decode(data):
+        samples = []
+        for _ in range(5):
+            started = time.perf_counter()
+            for _ in range(presses):
+                router.decode(data)
+            samples.append((time.perf_counter() - started) / presses)
+        return min(samples)
+
+    first_cost = per_decode(router.encode(first, *sample_args(first)))
+    last_cost = per_decode(router.encode(last, *sample_args(last)))
+    print(f"\ndecode: {first} {first_cost * 1e6:.2f} us, {last} {last_cost * 1e6:.2f} us")
+    assert last_cost < first_cost * 3
+    assert max(first_cost, last_cost) < 50e-6
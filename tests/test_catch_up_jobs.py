@@ -0,0 +1,48 @@
+import asyncio
+from datetime import timedelta
+from telegram.ext import Application
+from bot import bot_handler
+from scheduler.timeutils import now_utc
+
+def test_recovery_keeps_replays_when_the_next_run_is_in_the_window(monkeypatch):
+    now = now_utc().replace(second=0, microsecond=0)
+    missed = (now - timedelta(days=1, hours=1)).replace(tzinfo=None)
+    schedule = {
+        'id': 7,
+        'chat_id': -1001,
+        'instance_id': 'i-1',
+        'action': 'start',
+        'dias_semana': '0,1,2,3,4,5,6',
+        'horario': missed.strftime('%H:%M'),
+        'timezone': 'UTC',
+        'schedule_time': missed,
+    }
+
+    async def get_overdue_schedules(before, now):
+        return [schedule]
+
+    async def advance_overdue_schedules(updates):
+        return {schedule_id for schedule_id, _, _ in updates}
+
+    monkeypatch.setattr(bot_handler.db, 'get_overdue_schedules', get_overdue_schedules)
+    monkeypatch.setattr(bot_handler.db, 'advance_overdue_schedules', advance_overdue_schedules)
+    # A window wide enough to hold the next daily run, as after any refill with SCHEDULE_WINDOW_MINUTES >= 1 day
+    monkeypatch.setattr(bot_handler.janela, 'loaded_until', now + timedelta(days=2))
+
+    async def scenario():
+        application = Application.builder().token('123456:TEST').build()
+        job_queue = application.job_queue
+        try:
+            await bot_handler.recuperar_atrasados(job_queue)
+            return [job.data for job in job_queue.get_jobs_by_name('7')]
+        finally:
+            for job in job_queue.jobs():
+                job.schedule_removal()
+
+    jobs = asyncio.run(scenario())
+
+    replays = [data for data in jobs if data.get('catch_up')]
+    next_runs = [data for data in jobs if not data.get('catch_up')]
+    assert [data['schedule_time'] for data in replays] == [missed.replace(tzinfo=now.tzinfo)]
+    assert len(next_runs) == 1
+    assert next_runs[0]['schedule_time'] > now
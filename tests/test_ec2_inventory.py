@@ -0,0 +1,117 @@
+import sys
+import threading
+import time
+import pytest
+from aws.ec2_manager import EC2Manager
+
+SIZE = 500
+
+def fleet(generation):
+    # Each refresh returns a different fleet, so mixing indexes from two refreshes shows up as missing IDs or wrong names
+    return [
+        {'id': f"i-{generation % 2}{n:05d}", 'state': 'running', 'name': f"web-{generation}-{n}", 'region': 'us-east-1'}
+        for n in range(SIZE)
+    ]
+
+class FakeInventoryManager(EC2Manager):
+    def __init__(self):
+        super().__init__(regions=['us-east-1'])
+        self.generation = 0
+        self.listing = 0
+        self.max_listing = 0
+        self.counter_lock = threading.Lock()
+
+    def iter_instances(self, region=None):
+        with self.counter_lock:
+            self.generation += 1
+            generation = self.generation
+            self.listing += 1
+            self.max_listing = max(self.max_listing, self.listing)
+        try:
+            time.sleep(0.001)
+            return iter(fleet(generation))
+        finally:
+            with self.counter_lock:
+                self.listing -= 1
+
+@pytest.fixture
+def manager():
+    manager = FakeInventoryManager()
+    yield manager
+    manager.region_executor.shutdown(wait=False)
+
+@pytest.fixture
+def busy_switching():
+    # Makes threads switch as often as possible, so a torn read has a chance to happen
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+def consistent(instances):
+    return len({instance['name'].split('-')[1] for instance in instances}) <= 1
+
+def test_find_never_mixes_two_refreshes(manager, busy_switching):
+    manager.get_all_instances()
+    errors = []
+    stop = threading.Event()
+
+    def refresh():
+        while not stop.is_set():
+            manager.get_all_instances(use_cache=False)
+
+    def find():
+        try:
+            for _ in range(300):
+                for text in ('i-', '12', 'web'):
+                    found = manager.find_instances(text)
+                    assert found and consistent(found)
+        except Exception as e:
+            errors.append(e)
+
+    refreshers = [threading.Thread(target=refresh) for _ in range(2)]
+    finders = [threading.Thread(target=find) for _ in range(4)]
+    for thread in refreshers + finders:
+        thread.start()
+    for thread in finders:
+        thread.join()
+    stop.set()
+    for thread in refreshers:
+        thread.join()
+
+    assert errors == []
+
+def test_forced_refreshes_are_serialised(manager):
+    threads = [threading.Thread(target=manager.get_all_instances, kwargs={'use_cache': False}) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert manager.generation == 8
+    assert manager.max_listing == 1
+
+def test_cached_reads_share_one_refresh(manager):
+    threads = [threading.Thread(target=manager.get_all_instances) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert manager.generation == 1
+    assert sorted(manager.cached_instances(), key=lambda i: i['id']) == fleet(1)
+
+def test_get_instances_survives_the_cache_expiring_mid_call(manager):
+    manager.get_all_instances()
+    snapshot = manager._inventory
+    checks = []
+
+    def expires_after_first_check():
+        # Fresh when first looked at, expired from then on
+        checks.append(1)
+        return snapshot if len(checks) == 1 else None
+
+    manager._fresh_inventory = expires_after_first_check
+
+    instance = fleet(1)[0]
+    assert manager.get_instance(instance['id']) == instance
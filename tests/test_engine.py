@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from scheduler.engine import MISFIRE_RUN_ALL, MISFIRE_RUN_ONCE, MISFIRE_SKIP, missed_runs, plan_catch_up
+
+UTC = timezone.utc
+
+class FakeClock:
+    # Stands in for the wall clock; plan_catch_up takes 'now' explicitly
+    def __init__(self, now):
+        self.now = now
+
+    def advance(self, **kwargs):
+        self.now += timedelta(**kwargs)
+
+def daily(schedule_id, schedule_time, horario='08:00', timezone='UTC'):
+    return {
+        'id': schedule_id,
+        'instance_id': 'i-123',
+        'action': 'start',
+        'dias_semana': '0,1,2,3,4,5,6',
+        'horario': horario,
+        'timezone': timezone,
+        'schedule_time': schedule_time,
+    }
+
+def one_shot(schedule_id, schedule_time):
+    return {'id': schedule_id, 'instance_id': 'i-123', 'action': 'stop', 'dias_semana': '', 'horario': '', 'schedule_time': schedule_time}
+
+@pytest.fixture
+def downtime():
+    # The bot went down just before a daily 08:00 run and comes back three days and two hours later
+    clock = FakeClock(datetime(2026, 5, 4, 7, 0, tzinfo=UTC))
+    schedule = daily(1, datetime(2026, 5, 4, 8, 0))
+    clock.advance(days=3, hours=3)
+    return clock, schedule
+
+def test_run_once_replays_the_first_missed_run(downtime):
+    clock, schedule = downtime
+    [entry] = plan_catch_up([schedule], clock.now, MISFIRE_RUN_ONCE)
+    assert entry['schedule'] is schedule
+    assert entry['runs'] == [datetime(2026, 5, 4, 8, 0, tzinfo=UTC)]
+    assert entry['next_time'] == datetime(2026, 5, 8, 8, 0, tzinfo=UTC)
+
+def test_skip_replays_nothing_but_still_advances(downtime):
+    clock, schedule = downtime
+    [entry] = plan_catch_up([schedule], clock.now, MISFIRE_SKIP)
+    assert entry['runs'] == []
+    assert entry['next_time'] == datetime(2026, 5, 8, 8, 0, tzinfo=UTC)
+
+def test_run_all_replays_every_missed_run(downtime):
+    clock, schedule = downtime
+    [entry] = plan_catch_up([schedule], clock.now, MISFIRE_RUN_ALL, max_runs=10)
+    assert entry['runs'] == [datetime(2026, 5, day, 8, 0, tzinfo=UTC) for day in (4, 5, 6, 7)]
+    assert entry['next_time'] == datetime(2026, 5, 8, 8, 0, tzinfo=UTC)
+
+def test_run_all_is_capped_by_max_runs(downtime):
+    clock, schedule = downtime
+    clock.advance(days=30)
+    [entry] = plan_catch_up([schedule], clock.now, MISFIRE_RUN_ALL, max_runs=3)
+    # The oldest runs are replayed; the rest are skipped and the row still moves to the next future run
+    assert entry['runs'] == [datetime(2026, 5, day, 8, 0, tzinfo=UTC) for day in (4, 5, 6)]
+    assert entry['next_time'] == datetime(2026, 6, 7, 8, 0, tzinfo=UTC)
+
+def test_run_at_exactly_now_counts_as_missed():
+    now = datetime(2026, 5, 4, 8, 0, tzinfo=UTC)
+    [entry] = plan_catch_up([daily(1, datetime(2026, 5, 4, 8, 0))], now, MISFIRE_RUN_ALL)
+    assert entry['runs'] == [now]
+    assert entry['next_time'] == datetime(2026, 5, 5, 8, 0, tzinfo=UTC)
+
+@pytest.mark.parametrize('policy', [MISFIRE_RUN_ONCE, MISFIRE_SKIP, MISFIRE_RUN_ALL])
+def test_future_and_one_shot_rows_are_left_alone(policy):
+    now = datetime(2026, 5, 4, 12, 0, tzinfo=UTC)
+    schedules = [
+        daily(1, datetime(2026, 5, 5, 8, 0)),
+        one_shot(2, datetime(2026, 5, 1, 9, 0)),
+        daily(3, None),
+    ]
+    assert plan_catch_up(schedules, now, policy) == []
+
+def test_missed_runs_follow_the_schedule_timezone():
+    # 08:00 in New York is 12:00 UTC in summer and 13:00 UTC in winter
+    schedule = daily(1, datetime(2026, 10, 31, 12, 0), timezone='America/New_York')
+    now = datetime(2026, 11, 3, 0, 0, tzinfo=UTC)
+    assert missed_runs(schedule, now, 10) == [
+        datetime(2026, 10, 31, 12, 0, tzinfo=UTC),
+        datetime(2026, 11, 1, 13, 0, tzinfo=UTC),
+        datetime(2026, 11, 2, 13, 0, tzinfo=UTC),
+    ]
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        plan_catch_up([], datetime(2026, 5, 4, tzinfo=UTC), 'run_twice')
@@ -0,0 +1,32 @@
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from botocore.stub import Stubber
+from prometheus_client import REGISTRY
+from metrics import instrument_boto_client
+
+def stubbed_client():
+    client = instrument_boto_client(
+        boto3.client('ec2', region_name='us-east-1', aws_access_key_id='test', aws_secret_access_key='test')
+    )
+    stubber = Stubber(client)
+    stubber.activate()
+    return client, stubber
+
+def test_instrumentation_does_not_change_ec2_errors():
+    client, stubber = stubbed_client()
+    stubber.add_client_error('start_instances', 'IncorrectInstanceState', 'The instance is not in a state from which it can be started.')
+    labels = {'operation': 'Unknown', 'code': 'IncorrectInstanceState'}
+    before = REGISTRY.get_sample_value('ec2_api_errors_total', labels) or 0
+
+    with pytest.raises(ClientError) as raised:
+        client.start_instances(InstanceIds=['i-0123456789abcdef0'])
+
+    assert raised.value.response['Error']['Code'] == 'IncorrectInstanceState'
+    assert REGISTRY.get_sample_value('ec2_api_errors_total', labels) == before + 1
+
+def test_instrumentation_does_not_change_ec2_responses():
+    client, stubber = stubbed_client()
+    stubber.add_response('describe_instances', {'Reservations': []})
+
+    assert client.describe_instances()['Reservations'] == []
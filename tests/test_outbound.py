@@ -0,0 +1,92 @@
+import asyncio
+import random
+from telegram.error import BadRequest, NetworkError, RetryAfter
+from bot.outbound import MAX_MESSAGE_LENGTH, SEPARATOR, OutboundQueue
+
+NOTIFICATIONS = 500
+CHATS = (-1001, -1002)
+
+class FakeBot:
+    # Records delivered messages; failures[n] is raised instead of delivering the n-th call
+
+    def __init__(self, failures=None):
+        self.failures = failures or {}
+        self.calls = 0
+        self.sent = []
+
+    async def send_message(self, chat_id, text):
+        self.calls += 1
+        await asyncio.sleep(0.001)
+        failure = self.failures.get(self.calls)
+        if failure:
+            raise failure
+        message = (chat_id, text)
+        self.sent.append(message)
+        return message
+
+def delivered(bot, chat_id=None):
+    return [text for chat, message in bot.sent if chat_id in (None, chat) for text in message.split(SEPARATOR)]
+
+def notification(number, rng):
+    return f"notification {number} " + 'x' * rng.randint(10, 200)
+
+def test_burst_survives_flood_control_and_network_errors():
+    rng = random.Random(7)
+    failures = {
+        2: RetryAfter(1),
+        3: NetworkError('Connection reset'),
+        6: RetryAfter(1),
+        9: NetworkError('Timed out'),
+        10: RetryAfter(1),
+    }
+    bot = FakeBot(failures)
+    confirmed = []
+
+    async def burst():
+        queue = OutboundQueue(bot, rate_per_minute=600, burst=3, max_retries=5)
+        texts = {}
+        for number in range(NOTIFICATIONS):
+            chat_id = CHATS[number % len(CHATS)]
+            texts[number] = notification(number, rng)
+            queue.send(chat_id, texts[number], on_sent=lambda message, number=number: confirmed.append((number, message)))
+            if number % 50 == 0:
+                await asyncio.sleep(0.01)
+        await queue.stop(timeout=60)
+        return texts
+
+    texts = asyncio.run(burst())
+
+    # Every failure was retried, then everything went out exactly once
+    assert bot.calls == len(bot.sent) + len(failures)
+    assert sorted(delivered(bot)) == sorted(texts.values())
+    assert sorted(number for number, _ in confirmed) == list(range(NOTIFICATIONS))
+    assert all(len(text) <= MAX_MESSAGE_LENGTH for _, text in bot.sent)
+
+    for index, chat_id in enumerate(CHATS):
+        expected = [texts[number] for number in range(index, NOTIFICATIONS, len(CHATS))]
+        assert delivered(bot, chat_id) == expected
+
+    # on_sent gets the message that actually carried the notification
+    for number, (chat_id, text) in confirmed:
+        assert texts[number] in text.split(SEPARATOR)
+        assert chat_id == CHATS[number % len(CHATS)]
+
+    # Merging kept the burst far below one message per notification
+    assert len(bot.sent) < NOTIFICATIONS / 5
+
+def test_rejected_messages_are_dropped_without_blocking_the_chat():
+    bot = FakeBot({1: BadRequest('Chat not found')})
+    confirmed = []
+
+    async def scenario():
+        queue = OutboundQueue(bot, rate_per_minute=600, burst=1)
+        queue.send(CHATS[0], 'first', on_sent=lambda message: confirmed.append('first'))
+        await asyncio.sleep(0.05)
+        queue.send(CHATS[0], 'second', on_sent=lambda message: confirmed.append('second'))
+        await queue.stop(timeout=5)
+
+    asyncio.run(scenario())
+
+    assert delivered(bot) == ['second']
+    assert confirmed == ['second']
+
@@ -0,0 +1,69 @@
+import statistics
+import threading
+import time
+from datetime import datetime
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+CALLS = 200
+
+def get_schedule_by_id_unpooled(postgres_url, schedule_id):
+    # The pre-pool access pattern: one connection per call
+    conn = psycopg2.connect(postgres_url)
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute('SELECT * FROM schedules WHERE id = %s', (schedule_id,))
+            return cur.fetchone()
+    finally:
+        conn.close()
+
+def latency(func, calls=CALLS):
+    samples = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+def test_pooled_calls_are_faster_than_connect_per_call(sync_db, postgres_url):
+    schedule_id = sync_db.add_schedule(-1001, 'i-1', 'start', datetime(2030, 1, 1, 12, 0))
+
+    before = latency(lambda: get_schedule_by_id_unpooled(postgres_url, schedule_id))
+    after = latency(lambda: sync_db.get_schedule_by_id(schedule_id))
+
+    print(f"\nget_schedule_by_id median latency: connect per call {before * 1000:.2f} ms, pooled {after * 1000:.2f} ms")
+    assert sync_db.get_schedule_by_id(schedule_id)['instance_id'] == 'i-1'
+    assert after < before
+
+def test_checkout_replaces_a_dead_connection(sync_db):
+    with sync_db.get_connection() as conn:
+        dead = conn
+    dead.close()
+    # Force the health check on the next checkout
+    sync_db._last_used.clear()
+
+    with sync_db.get_connection() as conn:
+        assert conn is not dead
+        with conn.cursor() as cur:
+            cur.execute('SELECT 1')
+            assert cur.fetchone() == (1,)
+
+def test_more_threads_than_connections_wait_for_a_slot(sync_db):
+    errors = []
+
+    def worker():
+        try:
+            # get_connection directly, since the query helpers swallow psycopg2 errors
+            with sync_db.get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute('SELECT pg_sleep(0.05)')
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(sync_db.POSTGRES_POOL_MAX * 3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
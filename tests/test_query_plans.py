@@ -0,0 +1,90 @@
+import asyncio
+import json
+from datetime import timedelta
+import asyncpg
+import pytest
+from database import async_postgres as db
+from scheduler.timeutils import now_utc
+
+GROUP_ID = -1001
+ROWS = 100_000
+
+SEED = '''
+    INSERT INTO schedules (chat_id, instance_id, action, schedule_time, dias_semana, horario)
+    SELECT CASE WHEN n %% 10 = 0 THEN -2000 - n %% 7 ELSE %(group_id)s END,
+           'i-' || lpad(to_hex(n), 17, '0'),
+           CASE WHEN n %% 2 = 0 THEN 'start' ELSE 'stop' END,
+           CASE
+               -- Recurring rows always point at their next run within the coming week
+               WHEN n %% 5 = 0 THEN %(now)s + (n %% 10080) * interval '1 minute'
+               -- Future one-shot rows
+               WHEN n %% 5 = 1 THEN %(now)s + (n %% 43200) * interval '1 minute'
+               -- Executed one-shot rows pile up over the past year
+               ELSE %(now)s - (n %% 525600 + 1) * interval '1 minute'
+           END,
+           CASE WHEN n %% 5 = 0 THEN '0,1,2,3,4' END,
+           CASE WHEN n %% 5 = 0 THEN '09:00' END
+    FROM generate_series(1, %(rows)s) AS n
+'''
+
+class ExplainPool:
+    # Stands in for the asyncpg pool and records the plan of every query instead of running it
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.plans = []
+
+    async def fetch(self, query, *args):
+        rows = await self.conn.fetch('EXPLAIN (FORMAT JSON) ' + query, *args)
+        self.plans.append(json.loads(rows[0][0])[0]['Plan'])
+        return []
+
+def seq_scans(plan):
+    scans = []
+    if plan['Node Type'] == 'Seq Scan':
+        scans.append(plan.get('Relation Name'))
+    for child in plan.get('Plans', []):
+        scans += seq_scans(child)
+    return scans
+
+@pytest.fixture
+def seeded_db(sync_db):
+    with sync_db.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(SEED, {'group_id': GROUP_ID, 'now': now_utc().replace(tzinfo=None), 'rows': ROWS})
+        conn.commit()
+    with sync_db.get_connection(autocommit=True) as conn:
+        with conn.cursor() as cur:
+            cur.execute('ANALYZE schedules')
+    return sync_db
+
+def plan_of(postgres_url, monkeypatch, call):
+    async def scenario():
+        conn = await asyncpg.connect(postgres_url)
+        try:
+            pool = ExplainPool(conn)
+
+            async def get_pool():
+                return pool
+
+            monkeypatch.setattr(db, 'get_pool', get_pool)
+            await call()
+            return pool.plans
+        finally:
+            await conn.close()
+
+    plans = asyncio.run(scenario())
+    assert len(plans) == 1
+    return plans[0]
+
+HOT_QUERIES = {
+    'get_schedules_page': lambda now: db.get_schedules_page(GROUP_ID, 10, 0),
+    'get_schedules_between': lambda now: db.get_schedules_between(now, now + timedelta(minutes=60), 0, 500),
+    'get_overdue_schedules': lambda now: db.get_overdue_schedules(now - timedelta(seconds=60), now),
+}
+
+@pytest.mark.parametrize('name', sorted(HOT_QUERIES))
+def test_hot_queries_use_indexes(seeded_db, postgres_url, monkeypatch, name):
+    now = now_utc()
+    plan = plan_of(postgres_url, monkeypatch, lambda: HOT_QUERIES[name](now))
+    assert 'schedules' not in seq_scans(plan), json.dumps(plan, indent=2)
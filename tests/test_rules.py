@@ -0,0 +1,94 @@
+import random
+from datetime import datetime, timedelta, time as dt_time
+from zoneinfo import ZoneInfo
+import pytest
+import pytz
+from scheduler.rules import ALL_DAYS, days_to_mask, mask_to_days, parse_days, format_days, next_occurrence
+
+UTC = pytz.UTC
+NEW_YORK = pytz.timezone('America/New_York')
+ZONES = ['America/New_York', 'America/Sao_Paulo', 'Europe/Lisbon', 'Australia/Lord_Howe', 'UTC']
+
+def brute_force_next(days, horario, after, tz):
+    # The day-by-day loop confirmar_agendamento used before the closed form
+    agora = after.astimezone(tz)
+    for i in range(8):
+        data_teste = agora + timedelta(days=i)
+        if data_teste.weekday() in days:
+            data_agendamento = tz.localize(datetime.combine(data_teste.date(), horario))
+            if data_agendamento <= agora:
+                continue
+            return data_agendamento
+    return None
+
+def has_repeated_time(horario, after, tz):
+    start = after.astimezone(tz).date()
+    for i in range(9):
+        try:
+            tz.localize(datetime.combine(start + timedelta(days=i), horario), is_dst=None)
+        except pytz.AmbiguousTimeError:
+            return True
+        except pytz.NonExistentTimeError:
+            pass
+    return False
+
+def test_mask_round_trip():
+    for mask in range(ALL_DAYS + 1):
+        assert days_to_mask(mask_to_days(mask)) == mask
+        assert parse_days(format_days(mask)) == mask
+
+def test_matches_brute_force():
+    rng = random.Random(20260308)
+    start = datetime(2016, 1, 1, tzinfo=UTC)
+    compared = 0
+
+    for _ in range(20000):
+        tz = pytz.timezone(rng.choice(ZONES))
+        mask = rng.randint(1, ALL_DAYS)
+        horario = dt_time(rng.randrange(24), rng.choice([0, 15, 30, 45, rng.randrange(60)]))
+        after = start + timedelta(minutes=rng.randrange(60 * 24 * 365 * 12))
+        # The loop took the second occurrence of a repeated hour; the closed form takes the first on purpose
+        if has_repeated_time(horario, after, tz):
+            continue
+
+        expected = brute_force_next(mask_to_days(mask), horario, after, tz)
+        assert next_occurrence(mask, horario, after, tz) == expected, (tz.zone, mask, horario, after)
+        compared += 1
+
+    assert compared > 19000
+
+def test_matches_brute_force_around_transitions():
+    # Every quarter hour of the days around New York's 2026 transitions
+    for day in (datetime(2026, 3, 7), datetime(2026, 10, 31)):
+        for step in range(3 * 24 * 4):
+            after = NEW_YORK.localize(day + timedelta(minutes=15 * step)).astimezone(UTC)
+            for horario in (dt_time(1, 30), dt_time(2, 0), dt_time(2, 30), dt_time(3, 0)):
+                if has_repeated_time(horario, after, NEW_YORK):
+                    continue
+                expected = brute_force_next(list(range(7)), horario, after, NEW_YORK)
+                assert next_occurrence(ALL_DAYS, horario, after, NEW_YORK) == expected, (horario, after)
+
+def utc(*args):
+    return datetime(*args, tzinfo=UTC)
+
+@pytest.mark.parametrize('tz', [NEW_YORK, ZoneInfo('America/New_York')], ids=['pytz', 'zoneinfo'])
+@pytest.mark.parametrize('after, horario, expected', [
+    # Spring forward, 2026-03-08: 02:00-03:00 does not exist, so 02:30 runs at 03:30 EDT that day
+    (utc(2026, 3, 8, 5, 0), dt_time(2, 30), utc(2026, 3, 8, 7, 30)),
+    (utc(2026, 3, 8, 6, 45), dt_time(2, 30), utc(2026, 3, 8, 7, 30)),
+    (utc(2026, 3, 8, 7, 30), dt_time(2, 30), utc(2026, 3, 9, 6, 30)),
+    (utc(2026, 3, 8, 6, 0), dt_time(3, 0), utc(2026, 3, 8, 7, 0)),
+    # Fall back, 2026-11-01: 01:00-02:00 happens twice and 01:30 runs only at its first occurrence (EDT)
+    (utc(2026, 11, 1, 4, 0), dt_time(1, 30), utc(2026, 11, 1, 5, 30)),
+    (utc(2026, 11, 1, 5, 45), dt_time(1, 30), utc(2026, 11, 2, 6, 30)),
+    (utc(2026, 11, 1, 6, 15), dt_time(1, 30), utc(2026, 11, 2, 6, 30)),
+    (utc(2026, 11, 1, 5, 0), dt_time(2, 30), utc(2026, 11, 1, 7, 30)),
+])
+def test_dst_transition_days(tz, after, horario, expected):
+    result = next_occurrence(ALL_DAYS, horario, after, tz)
+    # Compared in UTC: aware datetimes inside a repeated hour never compare equal across zones (PEP 495)
+    assert result.astimezone(UTC) == expected
+    assert result > after
+
+def test_empty_mask_has_no_occurrence():
+    assert next_occurrence(0, dt_time(9, 0), utc(2026, 1, 1), NEW_YORK) is None
@@ -0,0 +1,110 @@
+import asyncio
+import multiprocessing
+import os
+from datetime import datetime, timedelta, timezone
+import pytest
+from scheduler.engine import plan_catch_up
+
+UTC = timezone.utc
+PROCESSES = 4
+RECURRING = 40
+ONE_SHOT = 10
+
+def claim_in_process(claims, node_id, barrier, results, crash):
+    # Runs in a fresh interpreter, like a separate bot replica
+    from database import async_postgres as db
+
+    async def claim():
+        barrier.wait()
+        return await db.claim_schedules(claims, node_id, 300)
+
+    claimed = asyncio.run(claim())
+    if crash:
+        # Dies before touching EC2 or the database again
+        os._exit(1)
+    results.put((node_id, sorted(claimed)))
+
+def run_replicas(claims, crash=False):
+    ctx = multiprocessing.get_context('spawn')
+    barrier = ctx.Barrier(PROCESSES)
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(target=claim_in_process, args=(claims, f"replica-{n}", barrier, results, crash))
+        for n in range(PROCESSES)
+    ]
+    for process in processes:
+        process.start()
+    claimed = {} if crash else dict(results.get(timeout=60) for _ in processes)
+    for process in processes:
+        process.join(timeout=60)
+        assert process.exitcode == (1 if crash else 0)
+    return claimed
+
+@pytest.fixture
+def due_schedules(sync_db):
+    # Recurring rows and one-shot rows that all came due a minute ago
+    planned = datetime.now(UTC).replace(second=0, microsecond=0, tzinfo=None) - timedelta(minutes=1)
+    horario = planned.strftime('%H:%M')
+    with sync_db.get_connection() as conn:
+        with conn.cursor() as cur:
+            for n in range(RECURRING + ONE_SHOT):
+                recurring = n < RECURRING
+                cur.execute(
+                    '''INSERT INTO schedules (chat_id, instance_id, action, schedule_time, dias_semana, horario, timezone)
+                       VALUES (%s, %s, 'start', %s, %s, %s, 'UTC')''',
+                    (-1001, f"i-{n}", planned, '0,1,2,3,4,5,6' if recurring else '', horario if recurring else '')
+                )
+        conn.commit()
+    rows = {row['id']: row for row in sync_db.get_schedules()}
+    claims = [
+        (schedule_id, row['schedule_time'], row['schedule_time'] + timedelta(days=1) if row['dias_semana'] else None)
+        for schedule_id, row in rows.items()
+    ]
+    return sync_db, claims
+
+def stored_times(db):
+    return {row['id']: row['schedule_time'] for row in db.get_schedules()}
+
+def overdue_plan():
+    from database import async_postgres as db
+
+    async def plan():
+        now = datetime.now(UTC)
+        try:
+            return plan_catch_up(await db.get_overdue_schedules(now, now), now, 'run_once')
+        finally:
+            await db.close_pool()
+    return asyncio.run(plan())
+
+def test_each_occurrence_is_claimed_by_one_replica(due_schedules):
+    db, claims = due_schedules
+
+    claimed = run_replicas(claims)
+
+    every_claim = [schedule_id for ids in claimed.values() for schedule_id in ids]
+    assert sorted(every_claim) == sorted(schedule_id for schedule_id, _, _ in claims)
+
+    # Claiming moved recurring rows to their next occurrence and left one-shot rows where they were
+    times = stored_times(db)
+    for schedule_id, planned, next_time in claims:
+        assert times[schedule_id] == (next_time or planned)
+
+    # A replica that wakes up late for the same occurrence finds nothing left to claim
+    assert run_replicas(claims) == {f"replica-{n}": [] for n in range(PROCESSES)}
+
+def test_crash_after_claim_is_not_replayed(due_schedules):
+    db, claims = due_schedules
+
+    run_replicas(claims, crash=True)
+
+    # Recovery on restart sees nothing overdue, even once the leases have expired
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("UPDATE schedules SET locked_until = (now() AT TIME ZONE 'UTC') - interval '1 second'")
+        conn.commit()
+    assert overdue_plan() == []
+
+    times = stored_times(db)
+    for schedule_id, planned, next_time in claims:
+        if next_time:
+            assert times[schedule_id] == next_time
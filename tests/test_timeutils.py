@@ -0,0 +1,79 @@
+from datetime import datetime, time as dt_time
+import pytest
+import pytz
+from scheduler.timeutils import (
+    DEFAULT_TZ, UTC, as_utc, format_local, get_timezone, is_valid_timezone, parse_time_input, schedule_timezone, to_local
+)
+
+NEW_YORK = pytz.timezone('America/New_York')
+
+def test_default_timezone_comes_from_config():
+    # conftest sets TZ_TIMEZONE
+    assert DEFAULT_TZ.zone == 'America/Sao_Paulo'
+    assert get_timezone() is DEFAULT_TZ
+
+def test_as_utc_treats_naive_values_as_utc():
+    assert as_utc(datetime(2026, 3, 8, 7, 0)) == datetime(2026, 3, 8, 7, 0, tzinfo=UTC)
+
+def test_as_utc_converts_aware_values():
+    local = NEW_YORK.localize(datetime(2026, 3, 8, 3, 0))
+    assert as_utc(local) == datetime(2026, 3, 8, 7, 0, tzinfo=UTC)
+    assert as_utc(local).tzinfo is UTC
+
+@pytest.mark.parametrize('utc_value, wall_time, offset_hours', [
+    # Spring forward: 01:59 EST is followed by 03:00 EDT
+    (datetime(2026, 3, 8, 6, 59), datetime(2026, 3, 8, 1, 59), -5),
+    (datetime(2026, 3, 8, 7, 0), datetime(2026, 3, 8, 3, 0), -4),
+    # Fall back: 01:30 happens twice, first as EDT then as EST
+    (datetime(2026, 11, 1, 5, 30), datetime(2026, 11, 1, 1, 30), -4),
+    (datetime(2026, 11, 1, 6, 30), datetime(2026, 11, 1, 1, 30), -5),
+])
+def test_to_local_across_dst(utc_value, wall_time, offset_hours):
+    local = to_local(utc_value, NEW_YORK)
+    assert local.replace(tzinfo=None) == wall_time
+    assert local.utcoffset().total_seconds() == offset_hours * 3600
+    assert as_utc(local) == as_utc(utc_value)
+
+def test_to_local_defaults_to_configured_zone():
+    # Sao Paulo has had no DST since 2019
+    assert to_local(datetime(2026, 1, 15, 12, 0)).strftime('%H:%M %z') == '09:00 -0300'
+    assert format_local(datetime(2026, 1, 15, 12, 0), '%d/%m %H:%M') == '15/01 09:00'
+
+def test_format_local_uses_the_given_zone():
+    assert format_local(datetime(2026, 7, 1, 12, 0), '%H:%M', get_timezone('Europe/Lisbon')) == '13:00'
+
+@pytest.mark.parametrize('schedule, expected', [
+    ({'timezone': 'Europe/Lisbon'}, 'Europe/Lisbon'),
+    ({'timezone': None}, 'America/Sao_Paulo'),
+    ({'timezone': ''}, 'America/Sao_Paulo'),
+    ({}, 'America/Sao_Paulo'),
+    (None, 'America/Sao_Paulo'),
+    # Rows are never rejected for a bad stored name; they run in the default zone
+    ({'timezone': 'Mars/Olympus_Mons'}, 'America/Sao_Paulo'),
+])
+def test_schedule_timezone(schedule, expected):
+    assert schedule_timezone(schedule).zone == expected
+
+def test_is_valid_timezone():
+    assert is_valid_timezone('America/New_York')
+    assert not is_valid_timezone('Mars/Olympus_Mons')
+
+@pytest.mark.parametrize('text, horario, zone', [
+    ('09:30', dt_time(9, 30), 'America/Sao_Paulo'),
+    ('00:00', dt_time(0, 0), 'America/Sao_Paulo'),
+    ('23:59', dt_time(23, 59), 'America/Sao_Paulo'),
+    ('14:00 Europe/Lisbon', dt_time(14, 0), 'Europe/Lisbon'),
+    ('  07:05   America/New_York  ', dt_time(7, 5), 'America/New_York'),
+    ('02:30 America/New_York', dt_time(2, 30), 'America/New_York'),
+])
+def test_parse_time_input(text, horario, zone):
+    assert parse_time_input(text) == (horario, get_timezone(zone))
+
+@pytest.mark.parametrize('text', ['9:30', '24:00', '12:60', 'noon', '', '09:30 Europe/Lisbon extra', '09-30'])
+def test_parse_time_input_rejects_bad_format(text):
+    with pytest.raises(ValueError):
+        parse_time_input(text)
+
+def test_parse_time_input_rejects_unknown_zone():
+    with pytest.raises(pytz.UnknownTimeZoneError):
+        parse_time_input('09:30 Mars/Olympus_Mons')
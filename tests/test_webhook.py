@@ -0,0 +1,131 @@
+import asyncio
+import json
+import socket
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from telegram.ext import Application, MessageHandler, filters
+from main import webhook_options
+
+SECRET = 'webhook-secret'
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+class FakeTelegram:
+    # Answers the Bot API calls made at startup and, like Telegram, posts updates to the registered webhook
+
+    def __init__(self):
+        self.webhook = None
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0)).decode()
+                params = dict(urllib.parse.parse_qsl(body)) if body else {}
+                method = self.path.rsplit('/', 1)[-1]
+                if method == 'getMe':
+                    result = {'id': 123456, 'is_bot': True, 'first_name': 'Test', 'username': 'test_bot'}
+                else:
+                    if method == 'setWebhook':
+                        fake.webhook = params
+                    result = True
+                payload = json.dumps({'ok': True, 'result': result}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/bot"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def post_update(self, update_id, text, secret_token):
+        headers = {'Content-Type': 'application/json'}
+        if secret_token is not None:
+            headers['X-Telegram-Bot-Api-Secret-Token'] = secret_token
+        update = {
+            'update_id': update_id,
+            'message': {'message_id': update_id, 'date': 0, 'chat': {'id': -1001, 'type': 'supergroup'}, 'text': text},
+        }
+        request = urllib.request.Request(self.webhook['url'], data=json.dumps(update).encode(), headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def telegram():
+    fake = FakeTelegram()
+    yield fake
+    fake.close()
+
+@pytest.mark.parametrize('url, secret_token, missing', [
+    (None, SECRET, 'WEBHOOK_URL'),
+    ('https://bot.example.com', None, 'WEBHOOK_SECRET_TOKEN'),
+    ('https://bot.example.com', '', 'WEBHOOK_SECRET_TOKEN'),
+])
+def test_webhook_mode_requires_url_and_secret(url, secret_token, missing):
+    with pytest.raises(ValueError, match=missing):
+        webhook_options(url=url, secret_token=secret_token)
+
+def test_webhook_options():
+    options = webhook_options(url='https://bot.example.com/', secret_token=SECRET, path='telegram')
+    assert options['webhook_url'] == 'https://bot.example.com/telegram'
+    assert options['secret_token'] == SECRET
+
+def test_only_updates_with_the_secret_reach_the_handlers(telegram):
+    port = free_port()
+    options = webhook_options(url=f"http://127.0.0.1:{port}", secret_token=SECRET, listen='127.0.0.1', port=port)
+    received = []
+
+    async def record(update, context):
+        received.append(update.message.text)
+
+    async def scenario():
+        application = Application.builder().token('123456:TEST').base_url(telegram.base_url).build()
+        application.add_handler(MessageHandler(filters.TEXT, record))
+        await application.initialize()
+        await application.updater.start_webhook(**options)
+        await application.start()
+        try:
+            statuses = {
+                'missing': await asyncio.to_thread(telegram.post_update, 1, 'missing', None),
+                'wrong': await asyncio.to_thread(telegram.post_update, 2, 'wrong', 'not-the-secret'),
+                'valid': await asyncio.to_thread(telegram.post_update, 3, 'valid', SECRET),
+            }
+            for _ in range(100):
+                if received:
+                    break
+                await asyncio.sleep(0.02)
+            # Give a wrongly accepted update time to show up as well
+            await asyncio.sleep(0.1)
+        finally:
+            await application.updater.stop()
+            await application.stop()
+            await application.shutdown()
+        return statuses
+
+    statuses = asyncio.run(scenario())
+
+    # The secret is registered with Telegram together with the webhook URL
+    assert telegram.webhook['url'] == options['webhook_url']
+    assert telegram.webhook['secret_token'] == SECRET
+    assert json.loads(telegram.webhook['allowed_updates']) == ['message', 'callback_query']
+
+    assert statuses == {'missing': 403, 'wrong': 403, 'valid': 200}
+    assert received == ['valid']